@@ -22,12 +22,12 @@ import json
 import logging
 import pkg_resources
 import re
+import threading
 import types
 import warnings
 import webbrowser
 
-from dropbot import SerialProxy
-from flatland import Integer, Float, Form, Enum, Boolean
+from flatland import Integer, Float, Form, Enum, Boolean, String
 from flatland.validation import ValueAtLeast
 from matplotlib.backends.backend_gtkagg import (FigureCanvasGTKAgg as
                                                 FigureCanvas)
@@ -38,8 +38,7 @@ from microdrop.plugin_helpers import (StepOptionsController, AppDataController)
 from microdrop.plugin_manager import (IPlugin, IWaveformGenerator, Plugin,
                                       implements, PluginGlobals,
                                       ScheduleRequest, emit_signal,
-                                      get_service_instance,
-                                      get_service_instance_by_name)
+                                      get_service_instance)
 from microdrop_utility.gui import yesno
 from pygtkhelpers.gthreads import gtk_threadsafe
 from pygtkhelpers.ui.dialogs import animation_dialog
@@ -58,7 +57,6 @@ import gtk
 # [1]: http://json-tricks.readthedocs.io/en/latest/#numpy-arrays
 import json_tricks
 import microdrop_utility as utility
-import numpy as np
 import pandas as pd
 import paho_mqtt_helpers as pmh
 import path_helpers as ph
@@ -66,6 +64,26 @@ import tables
 import zmq
 
 from ._version import get_versions
+from .board_worker import (BoardProxy, BoardWorker, CancelledError,
+                           CommandStats, PRIORITY_BULK, PRIORITY_INTERACTIVE,
+                           PRIORITY_SAFETY, PRIORITY_TELEMETRY)
+from .channel_states import ChannelStateBuffer, plan_channel_update
+from .device_info import DeviceInfo
+from .diagnostics import DiagnosticsRunner
+from .diagnostics_cache import DiagnosticsCache, test_passed
+from .diagnostics_store import DiagnosticsStore
+from .mqtt_publisher import CoalescingPublisher
+from .port_cache import PortCache, serial_port_infos
+from .port_discovery import discover_dropbot, probe_dropbot
+from .protocol_compiler import compile_steps
+from .results_io import ResultsWriter, start_report
+from .state_cache import AppliedStateCache
+from .step_scheduler import StepScheduler, monotonic
+from .step_transaction import apply_step
+from .telemetry import BufferedSampler, PeriodicSampler
+from .validation import (WaveformLimits, check_frequency, max_voltage,
+                         set_limits)
+from .zmq_watch import sockets_pending, watch_sockets
 __version__ = get_versions()['version']
 del get_versions
 
@@ -87,81 +105,130 @@ PluginGlobals.push_env('microdrop.managed')
 class DmfZmqPlugin(ZmqPlugin):
     """
     API for adding/clearing droplet routes.
+
+    .. versionchanged:: 0.17
+        Drain pending messages on each call to :meth:`check_sockets` (up to
+        :attr:`max_messages` per socket) and coalesce channel state replies
+        into a single channel state update.
     """
+    #: Default maximum number of frames to read from each socket per call to
+    #: :meth:`check_sockets`.
+    MAX_MESSAGES = 256
+
     def __init__(self, parent, *args, **kwargs):
         self.parent = parent
+        # Maximum number of frames to read from each socket per call to
+        # `check_sockets()`.  If `None`, drain sockets completely.
+        self.max_messages = kwargs.pop('max_messages', self.MAX_MESSAGES)
+        # Number of frames read from each socket during the most recent call
+        # to `check_sockets()`.
+        self.backlog_depth = {'command': 0, 'subscribe': 0}
+        # `True` if frames were still pending after the most recent call to
+        # `check_sockets()`, i.e., the message budget was exhausted.
+        self.backlog_pending = False
         super(DmfZmqPlugin, self).__init__(*args, **kwargs)
 
+    def _recv_pending(self, socket):
+        '''
+        Generate pending multipart messages from socket without blocking.
+
+        Stop after :attr:`max_messages` messages (if set).
+
+        .. versionadded:: 0.17
+        '''
+        count = 0
+        while self.max_messages is None or count < self.max_messages:
+            try:
+                msg_frames = socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            count += 1
+            yield msg_frames
+
+    @property
+    def sockets(self):
+        '''
+        .. versionadded:: 0.17
+
+        Returns
+        -------
+        list
+            Sockets processed by :meth:`check_sockets`.
+        '''
+        return [self.command_socket, self.subscribe_socket]
+
     def check_sockets(self):
         """
         Check for messages on command and subscription sockets and process
         any messages accordingly.
-        """
-        try:
-            msg_frames = self.command_socket.recv_multipart(zmq.NOBLOCK)
-        except zmq.Again:
-            pass
-        else:
-            self.on_command_recv(msg_frames)
 
-        try:
-            msg_frames = self.subscribe_socket.recv_multipart(zmq.NOBLOCK)
-            source, target, msg_type, msg_json = msg_frames
-            if all([source == 'microdrop.electrode_controller_plugin',
-                    msg_type == 'execute_reply']):
-                # The 'microdrop.electrode_controller_plugin' plugin maintains
-                # the requested state of each electrode.
-                msg = json.loads(msg_json)
-                if msg['content']['command'] in ('set_electrode_state',
-                                                 'set_electrode_states'):
-                    data = decode_content_data(msg)
-                    self.parent.actuated_area = data['actuated_area']
-                    self.parent.update_channel_states(data['channel_states'])
-                elif msg['content']['command'] == 'get_channel_states':
-                    data = decode_content_data(msg)
-                    self.parent.actuated_area = data['actuated_area']
-                    self.parent.channel_states =\
-                        self.parent.channel_states.iloc[0:0]
-                    self.parent.update_channel_states(data['channel_states'])
-            else:
-                self.most_recent = msg_json
-        except zmq.Again:
-            pass
-        except Exception:
-            logger.error('Error processing message from subscription '
-                         'socket.', exc_info=True)
-        return True
+        .. versionchanged:: 0.17
+            Read all pending messages (up to :attr:`max_messages` per socket)
+            rather than a single message per socket.
 
+            Coalesce channel state replies from the electrode controller plugin
+            into a single call to
+            :meth:`DropBotPlugin.update_channel_states`.
+        """
+        command_count = 0
+        for msg_frames in self._recv_pending(self.command_socket):
+            command_count += 1
+            self.on_command_recv(msg_frames)
 
-def max_voltage(element, state):
-    """Verify that the voltage is below a set maximum"""
-    service = get_service_instance_by_name(ph.path(__file__).parent.name)
-
-    if service.control_board and (element.value >
-                                  service.control_board.max_waveform_voltage):
-        return element.errors.append('Voltage exceeds the maximum value (%d '
-                                     'V).' % service.control_board
-                                     .max_waveform_voltage)
-    else:
-        return True
-
+        subscribe_count = 0
+        # Merged channel states from all electrode controller replies.
+        channel_states = None
+        actuated_area = None
+        # `True` if the cached channel states must be reset before applying
+        # merged channel states (i.e., a `get_channel_states` reply was read).
+        reset = False
 
-def check_frequency(element, state):
-    """Verify that the frequency is within the valid range"""
-    service = get_service_instance_by_name(ph.path(__file__).parent.name)
-
-    if service.control_board and (element.value <
-                                  service.control_board.min_waveform_frequency
-                                  or element.value >
-                                  service.control_board
-                                  .max_waveform_frequency):
-        return element.errors.append('Frequency is outside of the valid range '
-                                     '(%.1f - %.1f Hz).' %
-                                     (service.control_board
-                                      .min_waveform_frequency,
-                                      service.control_board
-                                      .max_waveform_frequency))
-    else:
+        for msg_frames in self._recv_pending(self.subscribe_socket):
+            subscribe_count += 1
+            try:
+                source, target, msg_type, msg_json = msg_frames
+                if all([source == 'microdrop.electrode_controller_plugin',
+                        msg_type == 'execute_reply']):
+                    # The 'microdrop.electrode_controller_plugin' plugin
+                    # maintains the requested state of each electrode.
+                    msg = json.loads(msg_json)
+                    command = msg['content']['command']
+                    if command in ('set_electrode_state',
+                                   'set_electrode_states'):
+                        data = decode_content_data(msg)
+                        actuated_area = data['actuated_area']
+                        if channel_states is None:
+                            channel_states = data['channel_states']
+                        else:
+                            # Most recent states take precedence.
+                            channel_states = (data['channel_states']
+                                              .combine_first(channel_states))
+                    elif command == 'get_channel_states':
+                        data = decode_content_data(msg)
+                        actuated_area = data['actuated_area']
+                        # Reply contains complete channel states, so any
+                        # earlier updates in this batch are superseded.
+                        channel_states = data['channel_states']
+                        reset = True
+                else:
+                    self.most_recent = msg_json
+            except Exception:
+                logger.error('Error processing message from subscription '
+                             'socket.', exc_info=True)
+
+        if channel_states is not None:
+            self.parent.actuated_area = actuated_area
+            if reset:
+                self.parent.channel_states.clear()
+            self.parent.update_channel_states(channel_states)
+
+        self.backlog_depth = {'command': command_count,
+                              'subscribe': subscribe_count}
+        self.backlog_pending = sockets_pending(self.sockets)
+        if self.backlog_pending:
+            logger.debug('0MQ message budget (%s) exhausted; messages still '
+                         'pending (read: %s)', self.max_messages,
+                         self.backlog_depth)
         return True
 
 
@@ -318,6 +385,51 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
 
     version = __version__
     plugin_name = str(ph.path(__file__).realpath().parent.name)
+    #: State message events that are deduplicated and coalesced before
+    #: publishing (see :meth:`trigger`).
+    COALESCED_EVENTS = ('set-stats', 'set-voltage', 'set-frequency',
+                        'set-capacitance')
+    #: Window (in seconds) within which state messages are coalesced.
+    MQTT_COALESCE_WINDOW = .05
+    #: Priority of control board commands, by command type (see
+    #: :class:`BoardWorker`).
+    BOARD_COMMAND_PRIORITIES = {'disable_hv_output': PRIORITY_SAFETY,
+                                'measure_capacitance': PRIORITY_TELEMETRY,
+                                'measure_voltage': PRIORITY_TELEMETRY,
+                                'self_test': PRIORITY_BULK,
+                                'system_info': PRIORITY_BULK,
+                                'test_channels': PRIORITY_BULK,
+                                'test_i2c': PRIORITY_BULK,
+                                'test_on_board_feedback_calibration':
+                                PRIORITY_BULK,
+                                'test_shorts': PRIORITY_BULK,
+                                'test_voltage': PRIORITY_BULK}
+    #: Queued control board commands that apply step state (cancelled when
+    #: high-voltage output is turned off; see :meth:`disable_hv_output`).
+    STEP_WRITE_COMMANDS = ('apply_step', 'enable_hv_output',
+                           'set_state_of_channels')
+    #: Maximum time (in seconds) to wait for serial ports to be probed
+    #: (concurrently) for a DropBot.
+    PORT_PROBE_TIMEOUT = 5.
+
+    #: Window (in seconds) after the most recent step change in realtime mode
+    #: before the step is applied to the control board (see
+    #: :meth:`on_step_run`).
+    REALTIME_DEBOUNCE_WINDOW = .1
+
+    #: Channel state update forms supported by the control board driver (see
+    #: :func:`channel_states.update_costs`).  ``set_state_of_channels`` only
+    #: accepts the packed states of all channels.
+    CHANNEL_UPDATE_FORMS = ('full', )
+
+    #: Diagnostic tests run when the experiment log changes (if the
+    #: "Auto-run diagnostic tests" app option is set).
+    AUTO_DIAGNOSTIC_TESTS = ('system_info', 'test_i2c', 'test_voltage',
+                             'test_shorts',
+                             'test_on_board_feedback_calibration')
+
+    #: Plugin that stores electrode actuation states of each protocol step.
+    ELECTRODE_CONTROLLER_PLUGIN = 'microdrop.electrode_controller_plugin'
 
     @property
     def StepFields(self):
@@ -328,20 +440,91 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         return self.get_step_form_class()
 
     def __init__(self):
+        # All control board access is executed by the hardware I/O worker
+        # thread (see `connect()`).
+        self.board_worker = BoardWorker()
+        self.board_worker.priorities.update(self.BOARD_COMMAND_PRIORITIES)
+        self.board_worker.start()
         self.control_board = None
+        # Properties of connected control board (see `connect()`).
+        self._device_info = None
         self.name = self.plugin_name
         self.connection_status = "Not connected"
         self.current_frequency = None
-        self.timeout_id = None
-        self.channel_states = pd.Series()
+        # Signal end of each protocol step (on main thread) at a monotonic
+        # deadline.
+        self.step_scheduler = \
+            StepScheduler(lambda func, *args:
+                          gobject.idle_add(func, *args,
+                                           priority=gobject.PRIORITY_HIGH))
+        self.step_scheduler.start()
+        self.channel_states = ChannelStateBuffer()
+        # Most recent values written to the control board.
+        self.applied_state = AppliedStateCache()
+        # Number of channel state updates sent, changed channels and payload
+        # bytes.
+        self.channel_update_stats = {'updates': 0, 'changed': 0, 'bytes': 0}
+        # Duration of each command applied by `apply_step()`.
+        self.step_apply_stats = CommandStats()
+        # Measure voltage in background thread, periodically and after
+        # waveform changes.
+        self.voltage_sampler = PeriodicSampler(self._measure_voltage,
+                                               interval=2.,
+                                               name='dropbot-voltage',
+                                               on_sample=self
+                                               ._on_voltage_sampled)
+        # Measure capacitance in background thread at configurable rate (see
+        # `capacitance_sample_rate` app option) and whenever electrode states
+        # change.  Publish measured capacitance at most once per second.
+        self.capacitance_sampler = \
+            BufferedSampler(self._measure_capacitance, size=1024,
+                            name='dropbot-capacitance',
+                            publish=self._publish_capacitance,
+                            publish_interval=1.)
         self.plugin = None
-        self.plugin_timeout_id = None
+        self.plugin_watcher = None
+        self.hub_socket_mode = None
         self.menu_items = []
         self.menu = None
         self.menu_item_root = None
         self.diagnostics_results_dir = '.dropbot-diagnostics'
+        # Most recent automatic diagnostic tests run.
+        self.diagnostics_run = None
+        # Experiment logs to attach results of `diagnostics_run` to.
+        self._diagnostics_logs = []
+        # Recent diagnostic test results (see `diagnostics_cache_ttl` app
+        # option).
+        self.diagnostics_cache = DiagnosticsCache()
+        # Indexed store of all diagnostic test results.
+        self.diagnostics_store = \
+            DiagnosticsStore(ph.path(self.diagnostics_results_dir)
+                             .joinpath('diagnostics.h5'))
+        # Serial port each DropBot was last connected on, by DropBot UUID.
+        self.port_cache = PortCache('.dropbot-port-cache.json')
         self.channels = None
         self.electrodes = None
+        # Channel number(s) of each electrode, indexed by electrode id.
+        self.electrode_channels = None
+        # Protocol compiled on protocol run (see `on_protocol_run()`).
+        self.compiled_protocol = None
+        # Step number of compiled channel states most recently loaded.
+        self._compiled_step = None
+        # Next step prepared during current step (see `_prefetch_step()`).
+        self._prefetched = None
+        # `True` while emitting waveform signals of a step applied by
+        # `apply_step()` (see `_run_step()`).
+        self._waveform_batched = False
+        # Pending realtime step application (see `on_step_run()`; only
+        # accessed in GTK main thread).
+        self._debounce_id = None
+        #: Number of realtime step runs superseded by a subsequent step run
+        #: within :attr:`REALTIME_DEBOUNCE_WINDOW`.
+        self.coalesced_step_runs = 0
+        # Outbound state messages publisher.
+        self.mqtt_publisher = \
+            CoalescingPublisher(lambda event, data:
+                                pmh.BaseMqttReactor.trigger(self, event, data),
+                                window=self.MQTT_COALESCE_WINDOW)
         pmh.BaseMqttReactor.__init__(self)
         self.start()
 
@@ -350,24 +533,106 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         self._connect()
         self.mqtt_client.loop_start()
 
+    def on_connect(self, *args, **kwargs):
+        '''
+        Handler called when connected (or reconnected) to the MQTT broker.
+
+        .. versionadded:: 0.17
+            Forget state messages published by :attr:`mqtt_publisher`, such
+            that the next state message of each event is published (rather
+            than deduplicated) after reconnecting.
+        '''
+        self.mqtt_publisher.forget()
+        return pmh.BaseMqttReactor.on_connect(self, *args, **kwargs)
+
+    def trigger(self, event, data):
+        '''
+        Publish message bound to event.
+
+        State messages (see :attr:`COALESCED_EVENTS`) are deduplicated and
+        coalesced by :attr:`mqtt_publisher`.
+
+        .. versionadded:: 0.17
+        '''
+        if event in self.COALESCED_EVENTS:
+            self.mqtt_publisher.submit(event, data)
+        else:
+            pmh.BaseMqttReactor.trigger(self, event, data)
+
+    @property
+    def device_info(self):
+        '''
+        .. versionadded:: 0.17
+
+        Returns
+        -------
+        DeviceInfo
+            Properties of connected control board (``None`` if not
+            connected).
+        '''
+        return self._device_info
+
+    @device_info.setter
+    def device_info(self, device_info):
+        self._device_info = device_info
+        # Update waveform limits used by step option validators.
+        set_limits(None if device_info is None
+                   else WaveformLimits.from_device_info(device_info))
+
     def on_channels_set(self, payload, args):
+        '''
+        .. versionchanged:: 0.17
+            Index channel numbers by electrode id.
+        '''
         self.channels = payload
+        channels = self.channels.dropna(subset=['electrode_id', 'channel'])
+        self.electrode_channels = (channels.set_index('electrode_id')
+                                   ['channel'].astype(int))
         self.read_capacitance()
 
     def on_electrodes_set(self, payload, args):
+        '''
+        .. versionchanged:: 0.17
+            Translate electrode states to channel states using electrode
+            channels index.  Electrodes may be mapped to multiple channels.
+        '''
         self.electrodes = payload
-        if (self.channels is None):
+        if self.electrode_channels is None:
             return
-        channel_states = pd.Series(name="channels")
-        for electode_id, state in self.electrodes.iteritems():
-            c = self.channels[self.channels['electrode_id'] == electode_id]
-            # XXX: Assuming electrodes only have one channel:
-            channel = c['channel'].values[0]
-            channel_states[str(channel)] = state
-
-        self.update_channel_states(channel_states)
+        self.update_channel_states(self.get_channel_states(self.electrodes))
         self.read_capacitance()
 
+    def get_channel_states(self, electrode_states):
+        '''
+        Translate electrode states to channel states.
+
+        .. versionadded:: 0.17
+
+        Parameters
+        ----------
+        electrode_states : dict or pandas.Series
+            Actuation state of each electrode, keyed by electrode id.
+
+        Returns
+        -------
+        pandas.Series
+            Actuation state of each channel mapped to any of the specified
+            electrodes, indexed by channel number.
+
+            A channel shared by multiple electrodes is actuated if any of its
+            electrodes is actuated.
+        '''
+        electrode_states = pd.Series(electrode_states)
+        electrode_channels = self.electrode_channels[self.electrode_channels
+                                                     .index
+                                                     .isin(electrode_states
+                                                           .index)]
+        channel_states = pd.Series(electrode_states
+                                   .reindex(electrode_channels.index).values,
+                                   index=electrode_channels.values,
+                                   name='channels')
+        return channel_states.groupby(level=0).max()
+
     def on_plugin_changed(self, payload, args):
         self.set_voltage(payload['default_voltage'])
         self.set_frequency(payload['default_frequency'])
@@ -396,15 +661,89 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
                      {'schema': form, 'pluginName': self.url_safe_plugin_name})
 
     def read_capacitance(self):
-        capacitance = None
-        if self.control_board:
-            capacitance = self.control_board.measure_capacitance()
-        print("<DropbotPlugin#read_capacitance> Capacitance: %s" % capacitance)
+        '''
+        Request fresh capacitance measurement from capacitance sampler.
 
+        .. versionchanged:: 0.17
+            Do not block waiting for measurement.  Measured capacitance is
+            published by the capacitance sampler thread.
+        '''
+        self.capacitance_sampler.request()
+
+    def _measure_capacitance(self):
+        '''
+        .. versionadded:: 0.17
+
+        Returns
+        -------
+        float
+            Measured capacitance (or ``None`` if no control board is
+            connected).
+        '''
+        control_board = self.control_board
+        if control_board is None:
+            return None
+        # Called from sampler thread; measure in hardware I/O worker thread
+        # to serialize with all other control board commands.
+        return control_board.run_job('measure_capacitance',
+                                     lambda board:
+                                     board.measure_capacitance())
+
+    def _publish_capacitance(self, capacitance, timestamp):
+        logger.debug('Capacitance: %s', capacitance)
         self.trigger("set-capacitance",
                      {'capacitance': capacitance,
                       'pluginName': self.url_safe_plugin_name})
 
+    def _measure_voltage(self):
+        '''
+        .. versionadded:: 0.17
+
+        Returns
+        -------
+        float
+            Measured high-voltage output (or ``None`` if no control board is
+            connected).
+        '''
+        control_board = self.control_board
+        if control_board is None:
+            return None
+        # Called from sampler thread; measure in hardware I/O worker thread
+        # to serialize with all other control board commands.
+        return control_board.run_job('measure_voltage',
+                                     lambda board: board.measure_voltage())
+
+    def _set_capacitance_sample_rate(self, rate):
+        '''
+        .. versionadded:: 0.17
+
+        Parameters
+        ----------
+        rate : float
+            Capacitance sample rate (in Hz).  If ``None`` or 0, capacitance is
+            only measured when electrode states change (and at least once a
+            minute).
+        '''
+        self.capacitance_sampler.interval = 1. / rate if rate else 60.
+
+    def _on_voltage_sampled(self, voltage, timestamp):
+        app = get_app()
+        if self.control_board and (app.realtime_mode or app.running):
+            self._update_voltage_label(voltage)
+
+    def _update_voltage_label(self, voltage):
+        '''
+        Schedule update of control board status label (including measured
+        voltage) in main GTK thread.
+
+        .. versionadded:: 0.17
+        '''
+        label = self.connection_status
+        if voltage is not None:
+            label += ', Voltage: %.1f V' % voltage
+        gobject.idle_add(get_app().main_window_controller
+                         .label_control_board_status.set_markup, label)
+
     @property
     def status(self):
         '''
@@ -424,14 +763,33 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         '''
         Run single DropBot on-board self-diagnostic test.
 
-        Record test results as JSON and display dialog to show text summary
-        (and plot, where applicable).
+        Record test results and display dialog to show text summary (and
+        plot, where applicable).
 
         .. versionadded:: 0.14
+
+        .. versionchanged:: 0.17
+            Reuse fresh cached result (see ``diagnostics_cache_ttl`` app
+            option).
+
+            Record test results in :attr:`diagnostics_store` rather than as a
+            JSON file.
         '''
-        test_func = getattr(db.hardware_test, test_name)
-        results = {test_name: test_func(self.control_board)}
-        db.hardware_test.log_results(results, self.diagnostics_results_dir)
+        results = self._cached_diagnostics([test_name])
+        if results:
+            logger.info('Using cached `%s` result.', test_name)
+        else:
+            test_func = getattr(db.hardware_test, test_name)
+            try:
+                # Run test as a single hardware I/O job to prevent other
+                # commands from being interleaved.
+                results = {test_name: self.control_board.run_job(test_name,
+                                                                 test_func)}
+            finally:
+                # Test may modify waveform and channel states.
+                self.applied_state.clear()
+            self._cache_diagnostics(results)
+            self._store_diagnostics(results)
         format_func = getattr(db.self_test, 'format_%s_results' % test_name)
         message = format_func(results[test_name])
         map(logger.info, map(unicode.rstrip, unicode(message).splitlines()))
@@ -453,35 +811,96 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         '''
         Run all DropBot on-board self-diagnostic tests.
 
-        Record test results as JSON and results summary as a Word document.
+        Record test results and results summary as a Word document.
 
         .. versionadded:: 0.14
 
         .. versionchanged:: 0.16
             Prompt user to insert DropBot test board.
+
+        .. versionchanged:: 0.17
+            Also record test results in :attr:`diagnostics_store`.
+
+            Write results of each test as soon as it completes, as a JSON
+            manifest with arrays stored in a compressed ``.npz`` sidecar (see
+            :class:`results_io.ResultsWriter`) rather than as a single JSON
+            file.
+
+            Generate Word report from saved results in a separate process,
+            and launch report once complete.
         '''
-        results = db.self_test.self_test(self.control_board)
         results_dir = ph.path(self.diagnostics_results_dir)
         results_dir.makedirs_p()
 
         # Create unique output filenames based on current timestamp.
         timestamp = dt.datetime.now().isoformat().replace(':', '_')
-        json_path = results_dir.joinpath('results-%s.json' % timestamp)
-        report_path = results_dir.joinpath('results-%s.docx' % timestamp)
+        report_path = results_dir.joinpath('self-test-%s.docx' % timestamp)
 
-        # Write test results encoded as JSON.
-        with json_path.open('w') as output:
-            # XXX Use `json_tricks` rather than standard `json` to support
-            # serializing [Numpy arrays and scalars][1].
-            #
-            # [1]: http://json-tricks.readthedocs.io/en/latest/#numpy-arrays
-            output.write(json_tricks.dumps(results, indent=4))
+        writer = ResultsWriter(results_dir.joinpath('self-test-%s' %
+                                                    timestamp))
+        try:
+            # Run tests as a single hardware I/O job to prevent other
+            # commands from being interleaved.
+            results = self.control_board.run_job('self_test',
+                                                 self._run_self_tests, writer)
+        finally:
+            # Tests may modify waveform and channel states.
+            self.applied_state.clear()
+        self._store_diagnostics(results)
+
+        # Generate test result summary report as Word document in a separate
+        # process (without blocking the GTK main thread).
+        process = start_report(writer.manifest_path, report_path)
+        thread = threading.Thread(target=self._wait_for_report,
+                                  args=(process, report_path),
+                                  name='dropbot-report')
+        thread.daemon = True
+        thread.start()
+
+    def _wait_for_report(self, process, report_path):
+        '''
+        Wait for report process to exit and notify GTK main thread.
+
+        .. versionadded:: 0.17
+        '''
+        output = process.communicate()[0]
+        gobject.idle_add(self._on_report_done, report_path,
+                         process.returncode, output)
+
+    def _on_report_done(self, report_path, returncode, output):
+        '''
+        Launch Word document report once generated.
+
+        .. versionadded:: 0.17
+        '''
+        if returncode == 0:
+            logger.info('Generated self-test report `%s`.', report_path)
+            report_path.launch()
+        else:
+            logger.error('Error generating self-test report `%s`:\n%s',
+                         report_path, output)
+        return False
+
+    @staticmethod
+    def _run_self_tests(board, writer):
+        '''
+        Run all self-tests, writing the results of each test as soon as it
+        completes.
+
+        .. versionadded:: 0.17
 
-        # Generate test result summary report as Word document.
-        db.self_test.generate_report(results, output_path=report_path,
-                                     force=True)
-        # Launch Word document report.
-        report_path.launch()
+        Parameters
+        ----------
+        board : dropbot.SerialProxy
+            Control board.
+        writer : results_io.ResultsWriter
+            Test results writer.
+        '''
+        results = {}
+        for test_name in db.self_test.ALL_TESTS:
+            results.update(db.self_test.self_test(board, tests=[test_name]))
+            writer.write(test_name, results[test_name])
+        return results
 
     def create_ui(self):
         '''
@@ -498,6 +917,9 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         .. versionchanged:: 0.16
             Prompt user to insert DropBot test board before running channels
             test.
+
+        .. versionchanged:: 0.17
+            Add "Import diagnostic test results" menu item.
         '''
         # Create head for DropBot on-board tests sub-menu.
         tests_menu_head = gtk.MenuItem('On-board self-_tests')
@@ -505,9 +927,12 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         # Create main DropBot menu.
         self.menu_items = [gtk.MenuItem('Run _all on-board self-tests...'),
                            gtk.MenuItem('_Help...'),
-                           gtk.SeparatorMenuItem(), tests_menu_head]
+                           gtk.SeparatorMenuItem(), tests_menu_head,
+                           gtk.MenuItem('_Import diagnostic test results')]
         self.menu_items[0].connect('activate', lambda menu_item:
                                    self.run_all_tests())
+        self.menu_items[4].connect('activate', lambda menu_item:
+                                   self.import_diagnostics())
         help_url = 'https://github.com/sci-bots/microdrop.dropbot-plugin/wiki/Quick-start-guide'
         self.menu_items[1].connect('activate', lambda menu_item:
                                    webbrowser.open_new_tab(help_url))
@@ -569,7 +994,29 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
             Float.named('default_frequency').using(default=10e3,
                                                    optional=True),
             Boolean.named('Auto-run diagnostic tests').using(default=True,
-                                                             optional=True))
+                                                             optional=True),
+            # .. versionadded:: 0.17
+            #
+            # Comma-separated names of automatic diagnostic tests to wait for
+            # before the experiment starts (all other tests run in the
+            # background).
+            String.named('diagnostic_tests_to_wait_for')
+            .using(default='', optional=True),
+            # .. versionadded:: 0.17
+            #
+            # Time (in seconds) diagnostic test results are reused for the
+            # same DropBot and firmware version (0 to always run tests).
+            Float.named('diagnostics_cache_ttl')
+            .using(default=600, optional=True,
+                   validators=[ValueAtLeast(minimum=0)]),
+            # .. versionadded:: 0.17
+            Enum.named('hub_socket_mode').using(default='event',
+                                                optional=True)
+            .valued('event', 'poll'),
+            # .. versionadded:: 0.17
+            Float.named('capacitance_sample_rate')
+            .using(default=5, optional=True,
+                   validators=[ValueAtLeast(minimum=0)]))
 
     def get_step_form_class(self):
         """
@@ -592,29 +1039,71 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
                                           check_frequency]))
 
     def update_channel_states(self, channel_states):
+        '''
+        .. versionchanged:: 0.17
+            Update preallocated channel states buffer in place.
+        '''
         logging.info('update_channel_states')
         # Update locally cached channel states with new modified states.
         try:
-            self.channel_states = channel_states.combine_first(self
-                                                               .channel_states)
+            self.channel_states.update(channel_states)
         except ValueError:
             logging.info('channel_states: %s', channel_states)
-            logging.info('self.channel_states: %s', self.channel_states)
+            logging.info('self.channel_states: %s',
+                         self.channel_states.states)
             logging.info('', exc_info=True)
         else:
-            app = get_app()
-            connected = self.control_board is not None
-            if connected and (app.realtime_mode or app.running):
-                self.on_step_run()
+            self._run_updated_channel_states()
+
+    @gtk_threadsafe  # Execute in GTK main thread
+    def _run_updated_channel_states(self):
+        '''
+        Apply updated channel states (may be requested from other threads,
+        e.g., MQTT client).
+
+        .. versionadded:: 0.17
+        '''
+        app = get_app()
+        connected = self.control_board is not None
+        if connected and (app.realtime_mode or app.running):
+            self.on_step_run()
 
     def cleanup_plugin(self):
-        if self.plugin_timeout_id is not None:
-            gobject.source_remove(self.plugin_timeout_id)
+        self.voltage_sampler.stop(timeout=1.)
+        self.capacitance_sampler.stop(timeout=1.)
+        self.mqtt_publisher.flush()
+        logger.debug('MQTT state messages: %s', self.mqtt_publisher.stats)
+        if self.plugin_watcher is not None:
+            self.plugin_watcher.stop()
+            self.plugin_watcher = None
         if self.plugin is not None:
             self.plugin = None
         if self.control_board is not None:
             self.control_board.terminate()
             self.control_board = None
+            self.device_info = None
+
+    def _watch_hub_sockets(self, mode):
+        '''
+        (Re)start processing of messages received on 0MQ hub plugin sockets.
+
+        .. versionadded:: 0.17
+
+        Parameters
+        ----------
+        mode : str
+            ``'event'``: process messages as soon as they arrive.
+
+            ``'poll'``: poll for messages every 10 ms.
+        '''
+        if self.plugin_watcher is not None:
+            self.plugin_watcher.stop()
+        self.hub_socket_mode = mode
+        self.plugin_watcher = watch_sockets(self.plugin.sockets,
+                                            self.plugin.check_sockets,
+                                            mode=mode)
+        logger.info('Processing 0MQ hub messages in `%s` mode.',
+                    self.plugin_watcher.mode)
 
     def on_plugin_enable(self):
         super(DropBotPlugin, self).on_plugin_enable()
@@ -631,10 +1120,16 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         # Initialize sockets.
         self.plugin.reset()
 
-        # Periodically process outstanding message received on plugin sockets.
-        self.plugin_timeout_id = gtk.timeout_add(10, self.plugin.check_sockets)
+        # Process messages received on plugin sockets from the GTK main loop,
+        # either as soon as they arrive (`event`) or periodically (`poll`).
+        self._watch_hub_sockets(self.get_app_values().get('hub_socket_mode')
+                                or 'event')
 
         self.check_device_name_and_version()
+        self.voltage_sampler.start()
+        self._set_capacitance_sample_rate(self.get_app_values()
+                                          .get('capacitance_sample_rate'))
+        self.capacitance_sampler.start()
         if get_app().protocol:
             self.on_step_run()
             self._update_protocol_grid()
@@ -648,17 +1143,27 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
     def on_app_exit(self):
         """
         Handler called just before the Microdrop application exits.
+
+        .. versionchanged:: 0.17
+            Cancel pending telemetry and bulk control board commands and turn
+            off high-voltage output *before* cleaning up plugin (which
+            disconnects the control board).
         """
-        self.cleanup_plugin()
+        self.board_worker.cancel_pending(PRIORITY_TELEMETRY)
         try:
-            self.control_board.hv_output_enabled = False
-            self.control_board.terminate()
-            self.control_board = None
+            # Wait for output to be turned off before disconnecting.
+            self.disable_hv_output().result(timeout=5.)
         except Exception:
             # ignore any exceptions (e.g., if the board is not connected)
             pass
+        self.cleanup_plugin()
+        logger.info('Control board commands: %s',
+                    self.board_worker.stats.summary())
+        self.step_scheduler.stop(timeout=1.)
+        self.board_worker.stop(timeout=5.)
 
     def on_protocol_swapped(self, old_protocol, protocol):
+        self.compiled_protocol = None
         self._update_protocol_grid()
 
     def _update_protocol_grid(self):
@@ -674,12 +1179,21 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
 
             if self.control_board:
                 for k, v in app_values.items():
-                    if k == 'serial_port' and self.control_board.port != v:
+                    if k == 'serial_port' and self.device_info.port != v:
                         reconnect = True
 
             if reconnect:
                 self.connect()
 
+            if (self.plugin is not None and
+                    app_values.get('hub_socket_mode') and
+                    self.hub_socket_mode != app_values['hub_socket_mode']):
+                # Switch 0MQ hub message processing mode.
+                self._watch_hub_sockets(app_values['hub_socket_mode'])
+
+            self._set_capacitance_sample_rate(app_values
+                                              .get('capacitance_sample_rate'))
+
             self._update_protocol_grid()
         elif plugin_name == app.name:
             # Turn off all electrodes if we're not in realtime mode and not
@@ -687,38 +1201,104 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
             if self.control_board and (not app.realtime_mode and
                                        not app.running):
                 logger.info('Turning off all electrodes.')
-                self.control_board.hv_output_enabled = False
+                self.disable_hv_output()
+            self._update_diagnostics_deferral()
 
     def connect(self):
         """
         Try to connect to the control board at the default serial port selected
         in the Microdrop application options.
 
-        If unsuccessful, try to connect to the control board on any available
-        serial port, one-by-one.
+        If unsuccessful, probe all available serial ports concurrently and
+        connect to the first port with a DropBot.
+
+        .. versionchanged:: 0.17
+            Connect from hardware I/O worker thread and wrap control board in a
+            :class:`BoardProxy` to execute all subsequent access in the worker
+            thread.
+
+            Probe available serial ports concurrently (rather than one-by-one).
+
+            Try ports of previously connected DropBots (see :attr:`port_cache`)
+            before the default serial port.
+
+            Read :attr:`device_info` snapshot of connected control board.
         """
         if self.control_board:
             self.control_board.terminate()
             self.control_board = None
+        self.device_info = None
         self.current_frequency = None
+        # State of newly connected control board is not known.
+        self.applied_state.clear()
+        self.voltage_sampler.clear()
+        self.capacitance_sampler.clear()
         serial_ports = list(get_serial_ports())
         if serial_ports:
             app_values = self.get_app_values()
-            # try to connect to the last successful port
+            port_infos = serial_port_infos()
+            # Try ports of previously connected DropBots (most recent first),
+            # then the last successful port.
+            candidates = self.port_cache.candidates(port_infos)
+            port = app_values.get('serial_port')
+            if port and port not in [port_i for uuid_i, port_i in candidates]:
+                candidates.append((None, port))
+
+            board = None
+            for uuid_i, port_i in candidates:
+                try:
+                    board = self.board_worker.call('connect', probe_dropbot,
+                                                   port_i)
+                    break
+                except Exception:
+                    logger.warning('Could not connect to control board on '
+                                   'port %s.', port_i, exc_info=True)
+                    if uuid_i is not None:
+                        self.port_cache.invalidate(uuid_i)
+            if board is None:
+                logger.warning('Checking other ports...')
+                board = self.board_worker.call('connect', discover_dropbot,
+                                               serial_ports,
+                                               timeout=self.PORT_PROBE_TIMEOUT)
+            # Route all access to the control board through the hardware I/O
+            # worker thread.
+            control_board = BoardProxy(self.board_worker, board)
             try:
-                port = app_values.get('serial_port')
-                self.control_board = SerialProxy(port=port)
+                control_board.initialize_switching_boards()
+                # Read properties that do not change while connected once.
+                self.device_info = control_board.run_job('device_info',
+                                                         DeviceInfo
+                                                         .from_board)
             except Exception:
-                logger.warning('Could not connect to control board on port %s.'
-                               ' Checking other ports...',
-                               app_values['serial_port'], exc_info=True)
-                self.control_board = SerialProxy()
-            self.control_board.initialize_switching_boards()
-            app_values['serial_port'] = self.control_board.port
+                control_board.terminate()
+                raise
+            self.control_board = control_board
+            self._update_port_cache(candidates, port_infos)
+            self.channel_states.resize(self.device_info.number_of_channels)
+            app_values['serial_port'] = self.device_info.port
             self.set_app_values(app_values)
         else:
             raise Exception("No serial ports available.")
 
+    def _update_port_cache(self, candidates, port_infos):
+        '''
+        Record port of connected DropBot in port cache.
+
+        Invalidate cached entries that were expected on the same port.
+
+        .. versionadded:: 0.17
+        '''
+        device_info = self.device_info
+        for uuid_i, port_i in candidates:
+            if port_i == device_info.port and uuid_i not in (None,
+                                                             device_info.uuid):
+                # A different DropBot is connected on the cached port.
+                self.port_cache.invalidate(uuid_i)
+        self.port_cache.update(device_info.uuid, device_info.id,
+                               device_info.port, device_info.software_version,
+                               port_info=port_infos.get(device_info.port))
+        self.port_cache.save()
+
     def check_device_name_and_version(self):
         """
         Check to see if:
@@ -732,14 +1312,14 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         """
         try:
             self.connect()
-            name = self.control_board.properties['package_name']
-            if name != self.control_board.host_package_name:
+            name = self.device_info.package_name
+            if name != self.device_info.host_package_name:
                 raise Exception("Device is not a DropBot")
 
             host_software_version = utility.Version.fromstring(
-                str(self.control_board.host_software_version))
+                self.device_info.host_software_version)
             remote_software_version = utility.Version.fromstring(
-                str(self.control_board.remote_software_version))
+                self.device_info.remote_software_version)
 
             @gtk_threadsafe
             def _firmware_check():
@@ -790,21 +1370,21 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
 
         .. versionchanged:: 0.14
             Schedule update of control board status label in main GTK thread.
+
+        .. versionchanged:: 0.17
+            Use cached device info rather than querying control board.
         '''
         self.connection_status = "Not connected"
         app = get_app()
-        connected = self.control_board is not None
-        if connected:
-            properties = self.control_board.properties
-            version = self.control_board.hardware_version
-            n_channels = self.control_board.number_of_channels
-            id = self.control_board.id
-            uuid = self.control_board.uuid
+        device_info = self.device_info
+        if self.control_board is not None and device_info is not None:
             self.connection_status = ('%s v%s (Firmware: %s, id: %s, uuid: '
                                       '%s)\n' '%d channels' %
-                                      (properties['display_name'], version,
-                                       properties['software_version'], id,
-                                       str(uuid)[:8], n_channels))
+                                      (device_info.display_name,
+                                       device_info.hardware_version,
+                                       device_info.software_version,
+                                       device_info.id, device_info.uuid[:8],
+                                       device_info.number_of_channels))
             self.trigger("set-stats", self.connection_status)
 
         # Schedule update of control board status label in main GTK thread.
@@ -822,62 +1402,355 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
 
         .. versionchanged:: 0.14
             Schedule update of control board status label in main GTK thread.
+
+        .. versionchanged:: 0.17
+            Skip high-voltage output and channel state writes that match the
+            most recently applied state.
+
+            Show voltage from background voltage sampler in status label
+            instead of measuring voltage.
+
+            While a protocol is running, look up step options and channel
+            states in the compiled protocol (see :meth:`on_protocol_run`).
+
+            Signal step completion using :attr:`step_scheduler` (measured from
+            start of step, including control board writes) instead of
+            :func:`gobject.timeout_add`.
+
+            Use channel states and waveform changes of step prepared during
+            previous step (see :meth:`_prefetch_step`), and record time of
+            transition from previous step.
+
+            In realtime mode (while no protocol is running), steps that
+            change the waveform voltage or frequency are applied only once no
+            step run has occurred for :attr:`REALTIME_DEBOUNCE_WINDOW` (i.e.,
+            only the latest step is applied).  Channel state changes and
+            steps that turn the voltage or all channels off are applied
+            immediately.
         """
         logger.debug('[DropBotPlugin] on_step_run()')
-        self._kill_running_step()
         app = get_app()
+        if (app.realtime_mode and not app.running and self.control_board and
+                self._is_waveform_changed() and not self._is_safety_off()):
+            self._debounce_step_run()
+            return
+        self._cancel_debounced_step_run()
+        self._run_step()
+
+    def _is_waveform_changed(self):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if the voltage or frequency of the current step differs
+            from the most recently applied waveform.
+        '''
+        options = self.get_step_options()
+        return not all(self.applied_state.matches(key, options[key])
+                       for key in ('frequency', 'voltage'))
+
+    def _is_safety_off(self):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if the current step turns voltage or all channels off.
+        '''
         options = self.get_step_options()
+        return options['voltage'] <= 0 or not self.channel_states.states.any()
+
+    def _debounce_step_run(self):
+        if self._debounce_id is not None:
+            gobject.source_remove(self._debounce_id)
+            self.coalesced_step_runs += 1
+            logger.debug('[DropBotPlugin] coalesced %d realtime step runs',
+                         self.coalesced_step_runs)
+        self._debounce_id = \
+            gobject.timeout_add(int(1e3 * self.REALTIME_DEBOUNCE_WINDOW),
+                                self._on_debounce_timeout)
+
+    def _cancel_debounced_step_run(self):
+        if self._debounce_id is not None:
+            gobject.source_remove(self._debounce_id)
+            self._debounce_id = None
+
+    def _on_debounce_timeout(self):
+        self._debounce_id = None
+        self._run_step()
+        return False  # stop the timeout from refiring
+
+    def _run_step(self):
+        # Step duration is measured from here, i.e., control board write
+        # latency counts towards the step duration.
+        # Any pending step is superseded when the step is scheduled (see
+        # `StepScheduler.schedule()`).
+        step_start = monotonic()
+        app = get_app()
+        step_number = self._get_compiled_step_number()
+        prefetched, self._prefetched = self._prefetched, None
+        if (prefetched is not None and
+                prefetched['step_number'] != step_number):
+            prefetched = None
+        if prefetched is not None:
+            options = prefetched['options']
+        elif step_number is not None:
+            options = self.compiled_protocol.step_options(step_number)
+        else:
+            options = self.get_step_options()
 
         if (self.control_board and (app.realtime_mode or app.running)):
-            max_channels = self.control_board.number_of_channels
-            # All channels should default to off.
-            channel_states = np.zeros(max_channels, dtype=int)
-            # Set the state of any channels that have been set explicitly.
-            channel_states[self.channel_states.index
-                           .values.tolist()] = self.channel_states
-
-            emit_signal("set_frequency",
-                        options['frequency'],
-                        interface=IWaveformGenerator)
-            emit_signal("set_voltage", options['voltage'],
-                        interface=IWaveformGenerator)
-            if not self.control_board.hv_output_enabled:
-                self.control_board.hv_output_enabled = True
-
-            label = (self.connection_status + ', Voltage: %.1f V' %
-                     self.control_board.measure_voltage())
-
-            # Schedule update of control board status label in main GTK thread.
-            gobject.idle_add(app.main_window_controller
-                             .label_control_board_status.set_markup, label)
-
-            self.control_board.set_state_of_channels(channel_states)
+            max_channels = self.device_info.number_of_channels
+            if self.channel_states.size < max_channels:
+                self.channel_states.resize(max_channels)
+            if step_number is not None and step_number != self._compiled_step:
+                # Load compiled channel states of new step.  Channel states
+                # set explicitly during the step are still applied in place.
+                if prefetched is not None:
+                    states = prefetched['channel_states']
+                else:
+                    states = self.compiled_protocol\
+                        .channel_states(step_number, size=max_channels)
+                if states is not None:
+                    self.channel_states.assign(states)
+                self._compiled_step = step_number
+            # All channels default to off.  Channels that have been set
+            # explicitly are updated in place in the channel states buffer.
+            channel_states = self.channel_states.states[:max_channels]
+
+            try:
+                if prefetched is not None:
+                    # Apply prefetched step in a single transaction, without
+                    # waiting for the control board.  Waveform options that
+                    # are unchanged (and match the control board) are
+                    # skipped.
+                    state = {'hv_output_enabled': True,
+                             'channel_states': channel_states}
+                    for key in ('frequency', 'voltage'):
+                        if (key in prefetched['waveform'] or not
+                                self.applied_state.matches(key,
+                                                           options[key])):
+                            state[key] = options[key]
+                    self.current_frequency = options['frequency']
+                    self.apply_step(state)
+                    # Notify waveform generator plugins of waveform changes.
+                    # This plugin's own handlers return immediately, since
+                    # the waveform is written (and read back values are
+                    # published) by `apply_step()`.
+                    self._waveform_batched = True
+                    try:
+                        for key in ('frequency', 'voltage'):
+                            if key in state:
+                                emit_signal('set_' + key, options[key],
+                                            interface=IWaveformGenerator)
+                    finally:
+                        self._waveform_batched = False
+                    self._update_voltage_label(self.voltage_sampler.latest)
+                else:
+                    self._apply_step_options(options, channel_states)
+                self.channel_states.clear_dirty()
+            except Exception:
+                # State of control board is not known.
+                self.applied_state.clear()
+                raise
+            logger.debug('[DropBotPlugin] control board writes: %s',
+                         self.applied_state.stats)
 
         # if a protocol is running, wait for the specified minimum duration
         if app.running:
-            logger.debug('[DropBotPlugin] on_step_run: '
-                         'timeout_add(%d, _callback_step_completed)' %
+            self.step_scheduler.record_transition()
+            logger.debug('[DropBotPlugin] on_step_run: schedule '
+                         '_callback_step_completed in %d ms' %
                          options['duration'])
-            self.timeout_id = gobject.timeout_add(
-                options['duration'], self._callback_step_completed)
+            self.step_scheduler.schedule(app.protocol.current_step_number,
+                                         options['duration'],
+                                         self._callback_step_completed,
+                                         start=step_start)
+            if step_number is not None:
+                # Prepare next step while waiting for the current step.
+                gobject.idle_add(self._prefetch_step, step_number + 1)
             return
         else:
             self.step_complete()
 
+    def _apply_step_options(self, options, channel_states):
+        '''
+        Apply waveform options (through :class:`IWaveformGenerator` signals),
+        enable high-voltage output and queue channel states write.
+        '''
+        emit_signal("set_frequency",
+                    options['frequency'],
+                    interface=IWaveformGenerator)
+        emit_signal("set_voltage", options['voltage'],
+                    interface=IWaveformGenerator)
+        if self.applied_state.should_write('hv_output_enabled', True):
+            self.applied_state.store('hv_output_enabled', True)
+            # Queue write without waiting for serial I/O.
+            future = self.control_board\
+                .submit_job('enable_hv_output', apply_step,
+                            {'hv_output_enabled': True})
+            future.add_done_callback(self._on_board_job_done)
+            self.voltage_sampler.request()
+
+        # Use most recent voltage measured by background sampler (rather than
+        # measuring voltage here).
+        self._update_voltage_label(self.voltage_sampler.latest)
+
+        # Compare actuation of each channel (i.e., any non-zero state is
+        # actuated), consistent with `plan_channel_update()`.
+        actuated = channel_states.astype(bool)
+        if self.applied_state.should_write('channel_states', actuated):
+            self._record_channel_update(plan_channel_update(
+                self.applied_state.get('channel_states'), actuated,
+                forms=self.CHANNEL_UPDATE_FORMS))
+            self.applied_state.store('channel_states', actuated)
+            # Queue channel states write without waiting for serial I/O (copy,
+            # since the channel states buffer is updated in place).
+            future = self.control_board\
+                .submit_job('set_state_of_channels',
+                            lambda board, states:
+                            board.set_state_of_channels(states),
+                            channel_states.copy())
+            future.add_done_callback(self._on_board_job_done)
+
+    def apply_step(self, state):
+        '''
+        Apply step state to the control board in a single transaction.
+
+        Commands are issued back-to-back by the hardware I/O worker thread
+        (see :func:`step_transaction.apply_step`), without waiting for the
+        result.  Values that match the most recently applied state are
+        skipped.
+
+        .. versionadded:: 0.17
+
+        Parameters
+        ----------
+        state : dict
+            Step state (see :data:`step_transaction.STEP_STATE_KEYS`).
+
+        Returns
+        -------
+        board_worker.Future
+            Values read back and duration of each command (see
+            :func:`step_transaction.apply_step`).
+        '''
+        pending = {}
+        for key, value in state.iteritems():
+            if key == 'measure_voltage':
+                pending[key] = value
+                continue
+            # Compare actuation of each channel (see `_apply_step_options()`).
+            cached = value.astype(bool) if key == 'channel_states' else value
+            if self.applied_state.should_write(key, cached):
+                if key == 'channel_states':
+                    self._record_channel_update(plan_channel_update(
+                        self.applied_state.get(key), cached,
+                        forms=self.CHANNEL_UPDATE_FORMS))
+                    # Copy, since the channel states buffer is updated in
+                    # place.
+                    value = value.copy()
+                self.applied_state.store(key, cached)
+                pending[key] = value
+        future = self.control_board.submit_job('apply_step', apply_step,
+                                               pending)
+        future.add_done_callback(self._on_step_applied)
+        return future
+
+    def _on_step_applied(self, future):
+        '''
+        Record command timings and publish values read back by
+        :meth:`apply_step`.
+
+        .. versionadded:: 0.17
+        '''
+        if future.exception() is not None:
+            self._on_board_job_done(future)
+            return
+        result = future.result()
+        for command, duration in result['timings'].iteritems():
+            self.step_apply_stats.record(command, 0., duration)
+        logger.debug('[DropBotPlugin] apply_step: %.1f ms %s',
+                     1e3 * result['duration'],
+                     ['%s: %.1f ms' % (command, 1e3 * duration)
+                      for command, duration in
+                      result['timings'].iteritems()])
+        readback = result['results']
+        for key in ('frequency', 'voltage'):
+            if key in readback:
+                self.applied_state.store(key + '_readback', readback[key],
+                                         count=False)
+                self.trigger('set-' + key, readback[key])
+        if any(command.endswith('=') for command in result['timings']):
+            # Waveform or high-voltage output changed.
+            self.voltage_sampler.request()
+
+    def _record_channel_update(self, update):
+        '''
+        Record number of changed channels and payload size of channel state
+        update.
+
+        .. versionadded:: 0.17
+        '''
+        if update is None:
+            # No channel state changed.
+            return
+        stats = self.channel_update_stats
+        stats['updates'] += 1
+        stats['changed'] += update.changed.size
+        stats['bytes'] += update.nbytes
+        logger.debug('[DropBotPlugin] channel update: %d changed, %d bytes '
+                     '(`%s`; bytes by form: %s)', update.changed.size,
+                     update.nbytes, update.form, update.costs)
+
+    def _prefetch_step(self, step_number):
+        '''
+        Prepare channel states and waveform changes of compiled protocol step
+        (e.g., next step, during current step).
+
+        .. versionadded:: 0.17
+        '''
+        self._prefetched = None
+        compiled = self.compiled_protocol
+        if (compiled is None or self.device_info is None or
+                step_number >= len(compiled)):
+            return False
+        options = compiled.step_options(step_number)
+        previous = (compiled.step_options(step_number - 1) if step_number
+                    else {})
+        self._prefetched = \
+            {'step_number': step_number, 'options': options,
+             'channel_states':
+             compiled.channel_states(step_number,
+                                     size=self.device_info.number_of_channels),
+             # Waveform options that differ from previous step.
+             'waveform': {key: options[key] for key in ('frequency', 'voltage')
+                          if options[key] != previous.get(key)}}
+        return False  # Do not call again.
+
+    def _get_compiled_step_number(self):
+        '''
+        Returns
+        -------
+        int
+            Current step number if a protocol is running and the compiled
+            protocol is up to date, otherwise ``None``.
+        '''
+        app = get_app()
+        compiled = self.compiled_protocol
+        if not app.running or compiled is None or not app.protocol:
+            return None
+        step_number = app.protocol.current_step_number
+        if len(compiled) != len(app.protocol) or step_number >= len(compiled):
+            return None
+        return step_number
+
     def step_complete(self, return_value=None):
         app = get_app()
         if app.running or app.realtime_mode:
             emit_signal('on_step_complete', [self.name, return_value])
 
-    def on_step_complete(self, plugin_name, return_value=None):
-        if plugin_name == self.name:
-            self.timeout_id = None
-
     def _kill_running_step(self):
-        if self.timeout_id:
-            logger.debug('[DropBotPlugin] _kill_running_step: removing'
-                         'timeout_id=%d' % self.timeout_id)
-            gobject.source_remove(self.timeout_id)
+        self.step_scheduler.cancel()
 
     def _callback_step_completed(self):
         logger.debug('[DropBotPlugin] _callback_step_completed')
@@ -887,25 +1760,160 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
     def on_protocol_run(self):
         """
         Handler called when a protocol starts running.
+
+        .. versionchanged:: 0.17
+            Warn about steps with voltage or frequency outside of control board
+            limits.
+
+            Compile protocol (see :meth:`compile_protocol`) and warn about
+            steps actuating channels not available on the control board.
         """
         app = get_app()
+        self.compiled_protocol = self.compile_protocol()
+        self._compiled_step = None
+        self._prefetched = None
+        self.step_scheduler.reset()
+        self._update_diagnostics_deferral()
+        logger.info('[DropBotPlugin] compiled %d steps in %.1f ms (%d bytes)',
+                    len(self.compiled_protocol),
+                    1e3 * self.compiled_protocol.compile_time,
+                    self.compiled_protocol.nbytes)
         if not self.control_board:
             logger.warning("Warning: no control board connected.")
-        elif (self.control_board.number_of_channels <=
+        elif (self.device_info.number_of_channels <=
               app.dmf_device.max_channel()):
             logger.warning("Warning: currently connected board does not have "
                            "enough channels for this protocol.")
+        if self.control_board:
+            invalid = self.compiled_protocol\
+                .validate(self.device_info.number_of_channels)
+            if invalid['voltage'].size:
+                logger.warning('Warning: voltage exceeds the maximum value '
+                               '(%d V) in steps: %s',
+                               self.device_info.max_waveform_voltage,
+                               invalid['voltage'].tolist())
+            if invalid['frequency'].size:
+                logger.warning('Warning: frequency is outside of the valid '
+                               'range (%.1f - %.1f Hz) in steps: %s',
+                               self.device_info.min_waveform_frequency,
+                               self.device_info.max_waveform_frequency,
+                               invalid['frequency'].tolist())
+            if invalid['channels'].size:
+                logger.warning('Warning: channels not available on the '
+                               'control board (%d channels) are actuated in '
+                               'steps: %s',
+                               self.device_info.number_of_channels,
+                               invalid['channels'].tolist())
+
+    def compile_protocol(self):
+        '''
+        Compile channel states and waveform options of all protocol steps
+        into contiguous arrays.
+
+        .. versionadded:: 0.17
+
+        Returns
+        -------
+        protocol_compiler.CompiledProtocol
+        '''
+        app = get_app()
+        steps = app.protocol.steps if app.protocol else []
+        step_options = [self.get_step_options(i) for i in xrange(len(steps))]
+        electrode_states = [self._get_step_electrode_states(step)
+                            for step in steps]
+        channel_count = (self.device_info.number_of_channels
+                         if self.device_info else 0)
+        return compile_steps(step_options, electrode_states,
+                             self.electrode_channels,
+                             channel_count=channel_count)
+
+    def _get_step_electrode_states(self, step):
+        '''
+        Returns
+        -------
+        pandas.Series
+            Electrode actuation states stored in step by electrode controller
+            plugin, or ``None`` if not available.
+        '''
+        # `None` if electrode controller has not stored data for step.
+        data = step.get_data(self.ELECTRODE_CONTROLLER_PLUGIN)
+        if data is None:
+            return None
+        elif isinstance(data, dict):
+            return data.get('electrode_states')
+        logger.warning('Unexpected electrode controller step data (`%s`); '
+                       'channel states of step are not compiled.',
+                       type(data).__name__)
+        return None
 
     def on_protocol_pause(self):
         """
         Handler called when a protocol is paused.
+
+        .. versionchanged:: 0.17
+            Log planned vs. actual step timing of run.
         """
         app = get_app()
         self._kill_running_step()
+        timing = self.step_scheduler.summary()
+        if timing['steps']:
+            logger.info('[DropBotPlugin] step timing: %s', timing)
+            logger.info('[DropBotPlugin] channel updates: %s',
+                        self.channel_update_stats)
+            logger.info('[DropBotPlugin] apply_step commands: %s',
+                        self.step_apply_stats.summary())
         if self.control_board and not app.realtime_mode:
             # Turn off all electrodes
             logger.debug('Turning off all electrodes.')
-            self.control_board.hv_output_enabled = False
+            self.disable_hv_output()
+        self._update_diagnostics_deferral()
+
+    def _on_board_job_done(self, future):
+        '''
+        Log error and invalidate applied state cache if queued control board
+        command failed.
+
+        .. versionadded:: 0.17
+        '''
+        exception = future.exception()
+        if isinstance(exception, CancelledError):
+            # Pending write cancelled (e.g., by `disable_hv_output()`).
+            self.applied_state.clear()
+        elif exception is not None:
+            # State of control board is not known.
+            self.applied_state.clear()
+            logger.error('Error executing `%s`: %s', future.command,
+                         exception)
+
+    def disable_hv_output(self):
+        '''
+        Turn off high-voltage output (i.e., all electrodes).
+
+        The command is executed ahead of any pending telemetry or bulk
+        commands (e.g., capacitance measurements, diagnostic tests).  Pending
+        step writes (see :attr:`STEP_WRITE_COMMANDS`) are cancelled, since
+        they would turn high-voltage output back on.
+
+        The command is queued without waiting for serial I/O.
+
+        .. versionadded:: 0.17
+
+        Returns
+        -------
+        board_worker.Future
+            Result of command.
+        '''
+        # Do not re-apply pending realtime step after turning output off.
+        self._cancel_debounced_step_run()
+        self.board_worker.cancel_pending(PRIORITY_INTERACTIVE,
+                                         commands=self.STEP_WRITE_COMMANDS)
+        # Subsequent writes must not be skipped, since the control board state
+        # is reset when high-voltage output is disabled.
+        self.applied_state.clear()
+        future = self.control_board.submit_job('disable_hv_output', setattr,
+                                               'hv_output_enabled', False)
+        future.add_done_callback(self._on_board_job_done)
+        return future
 
     def on_experiment_log_selection_changed(self, data):
         """
@@ -922,10 +1930,22 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
 
         Parameters:
             voltage : RMS voltage
+
+        .. versionchanged:: 0.17
+            Skip write if voltage matches most recently applied voltage, or if
+            voltage is applied as part of a step (see :meth:`apply_step`).
+
+            Queue write (see :meth:`apply_step`) without waiting for serial
+            I/O; the read back voltage is published once applied.
         """
         logger.info("[DropBotPlugin].set_voltage(%.1f)" % voltage)
-        self.control_board.voltage = voltage
-        self.trigger("set-voltage", self.control_board.voltage)
+        if self._waveform_batched:
+            return
+        if self.applied_state.should_write('voltage', voltage):
+            self.apply_step({'voltage': voltage})
+        else:
+            self.trigger("set-voltage",
+                         self.applied_state.get('voltage_readback'))
 
     def set_frequency(self, frequency):
         """
@@ -933,15 +1953,30 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
 
         Parameters:
             frequency : frequency in Hz
+
+        .. versionchanged:: 0.17
+            Skip write if frequency matches most recently applied frequency,
+            or if frequency is applied as part of a step (see
+            :meth:`apply_step`).
+
+            Queue write (see :meth:`apply_step`) without waiting for serial
+            I/O; the read back frequency is published once applied.
         """
         logger.info("[DropBotPlugin].set_frequency(%.1f)" % frequency)
-        self.control_board.frequency = frequency
+        if self._waveform_batched:
+            return
         self.current_frequency = frequency
-        self.trigger("set-frequency", self.control_board.frequency)
+        if self.applied_state.should_write('frequency', frequency):
+            self.apply_step({'frequency': frequency})
+        else:
+            self.trigger("set-frequency",
+                         self.applied_state.get('frequency_readback'))
 
     def on_step_options_changed(self, plugin, step_number):
         logger.info('[DropBotPlugin] on_step_options_changed(): %s step #%d',
                     plugin, step_number)
+        # Compiled protocol is out of date.
+        self.compiled_protocol = None
         app = get_app()
         if (app.protocol and not app.running and not app.realtime_mode and
             (plugin == 'microdrop.gui.dmf_device_controller' or plugin ==
@@ -952,6 +1987,7 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         logger.info('[DropBotPlugin] on_step_swapped():'
                     'original_step_number=%d, new_step_number=%d',
                     original_step_number, new_step_number)
+        self.compiled_protocol = None
         self.on_step_options_changed(self.name,
                                      get_app().protocol.current_step_number)
 
@@ -962,6 +1998,19 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         .. versionchanged:: 0.16.1
             Only attempt to run diagnostic tests if DropBot hardware is
             connected.
+
+        .. versionchanged:: 0.17
+            Use cached device info rather than querying control board.
+
+            Run diagnostic tests in the background and attach results to the
+            experiment log once complete.  Only wait for tests listed in the
+            ``diagnostic_tests_to_wait_for`` app option.
+
+            Reuse fresh cached test results (see ``diagnostics_cache_ttl`` app
+            option), i.e., only run stale or failed tests.
+
+            Defer tests while a protocol is running or in realtime mode, and
+            re-apply the current step after each test.
         '''
         # Check if the experiment log already has control board meta data, and
         # if so, return.
@@ -973,18 +2022,15 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         # add the name, hardware version, id, and firmware version to the
         # experiment log metadata
         data = {}
-        if self.control_board:
-            data["control board name"] = \
-                self.control_board.properties['display_name']
-            data["control board id"] = \
-                self.control_board.id
-            data["control board uuid"] = \
-                self.control_board.uuid
-            data["control board hardware version"] = (self.control_board
+        device_info = self.device_info
+        if self.control_board and device_info is not None:
+            data["control board name"] = device_info.display_name
+            data["control board id"] = device_info.id
+            data["control board uuid"] = device_info.uuid
+            data["control board hardware version"] = (device_info
                                                       .hardware_version)
-            data["control board software version"] = (self.control_board
-                                                      .properties
-                                                      ['software_version'])
+            data["control board software version"] = (device_info
+                                                      .software_version)
             # add info about the devices on the i2c bus
             """
             try:
@@ -1001,21 +2047,207 @@ class DropBotPlugin(Plugin, StepOptionsController, AppDataController,
         app_values = self.get_app_values()
         if self.status == 'connected' and app_values.get('Auto-run diagnostic '
                                                          'tests'):
-            logger.info('Running diagnostic tests')
-            tests = ['system_info',
-                     'test_i2c',
-                     'test_voltage',
-                     'test_shorts',
-                     'test_on_board_feedback_calibration']
-            results = {}
-
-            for test in tests:
-                test_func = getattr(db.hardware_test, test)
-                results[test] = test_func(self.control_board)
-            db.hardware_test.log_results(results, self.diagnostics_results_dir)
+            if (self.diagnostics_run is not None and
+                    not self.diagnostics_run.done()):
+                # Attach results of running tests to this log as well.
+                logger.info('Diagnostic tests already running.')
+                self._diagnostics_logs.append(log)
+                return
+            wait_for = [test_i.strip() for test_i in
+                        (app_values.get('diagnostic_tests_to_wait_for') or
+                         '').split(',') if test_i.strip()]
+            # Only run tests without a fresh cached result, i.e., stale or
+            # failed tests.
+            cached = self._cached_diagnostics(self.AUTO_DIAGNOSTIC_TESTS)
+            # Run tests to wait for first.
+            tests = sorted([test_i for test_i in self.AUTO_DIAGNOSTIC_TESTS
+                            if test_i not in cached],
+                           key=lambda test_i: test_i not in wait_for)
+            logger.info('Running diagnostic tests: %s (cached: %s)',
+                        ', '.join(tests), ', '.join(sorted(cached)))
+            logs = self._diagnostics_logs = [log]
+            self.diagnostics_run = \
+                DiagnosticsRunner(self.control_board, tests,
+                                  on_progress=self._on_diagnostics_progress,
+                                  on_complete=lambda run:
+                                  gobject.idle_add(self
+                                                   ._on_diagnostics_complete,
+                                                   run, logs, cached),
+                                  after_test=self._after_diagnostic_test)
+            # Defer tests while a protocol is running or in realtime mode.
+            self._update_diagnostics_deferral()
+            self.diagnostics_run.start()
+            if wait_for and self.diagnostics_run.paused:
+                logger.info('Diagnostic tests deferred; not waiting for: %s',
+                            ', '.join(wait_for))
+            elif wait_for:
+                logger.info('Waiting for diagnostic tests: %s',
+                            ', '.join(wait_for))
+                self.diagnostics_run.wait(wait_for)
         else:
             logger.info('DropBot not connected - not running diagnostic tests')
 
+    def _update_diagnostics_deferral(self):
+        '''
+        Defer background diagnostic tests while a protocol is running or in
+        realtime mode, i.e., while the control board is actuating electrodes;
+        otherwise, resume tests.
+
+        .. versionadded:: 0.17
+        '''
+        run = self.diagnostics_run
+        if run is None or run.done():
+            return
+        app = get_app()
+        if app.running or app.realtime_mode:
+            if not run.paused:
+                logger.info('Deferring diagnostic tests.')
+            run.pause()
+        elif run.paused:
+            logger.info('Resuming diagnostic tests.')
+            run.resume()
+
+    def _after_diagnostic_test(self):
+        '''
+        Called from hardware I/O worker thread after each diagnostic test.
+
+        .. versionadded:: 0.17
+        '''
+        # Tests may modify waveform and channel states.
+        self.applied_state.clear()
+        gobject.idle_add(self._reapply_step)
+
+    def _reapply_step(self):
+        '''
+        Re-apply current step (e.g., after a diagnostic test) if a protocol is
+        running or in realtime mode.
+
+        .. versionadded:: 0.17
+        '''
+        app = get_app()
+        if self.control_board and (app.running or app.realtime_mode):
+            self._run_step()
+        return False
+
+    def _cached_diagnostics(self, tests):
+        '''
+        Returns
+        -------
+        dict
+            Fresh cached result of each of :data:`tests` for the connected
+            DropBot and firmware version (see ``diagnostics_cache_ttl`` app
+            option), by test name.
+
+        .. versionadded:: 0.17
+        '''
+        ttl = self.get_app_values().get('diagnostics_cache_ttl')
+        device_info = self.device_info
+        if not ttl or device_info is None:
+            return {}
+        self.diagnostics_cache.ttl = ttl
+        return self.diagnostics_cache.fresh(device_info.uuid,
+                                            device_info.software_version,
+                                            tests)
+
+    def _cache_diagnostics(self, results):
+        '''
+        Cache results of passing tests (see
+        :func:`diagnostics_cache.test_passed`) for connected DropBot.
+
+        Results of failing tests are not cached, i.e., failing tests are
+        re-run.
+
+        .. versionadded:: 0.17
+        '''
+        device_info = self.device_info
+        if device_info is None:
+            return
+        for test_name, result in results.iteritems():
+            if not test_passed(test_name, result):
+                logger.info('Diagnostic test `%s` failed; result not cached.',
+                            test_name)
+                continue
+            self.diagnostics_cache.store(device_info.uuid,
+                                         device_info.software_version,
+                                         test_name, result)
+
+    def _store_diagnostics(self, results):
+        '''
+        Append test results of connected DropBot to :attr:`diagnostics_store`.
+
+        .. versionadded:: 0.17
+        '''
+        device_info = self.device_info
+        try:
+            self.diagnostics_store\
+                .append(device_info.uuid if device_info else None, results,
+                        software_version=device_info.software_version
+                        if device_info else None)
+        except Exception:
+            logger.error('Error recording diagnostic test results.',
+                         exc_info=True)
+
+    @gtk_threadsafe  # Execute in GTK main thread
+    @error_ignore(lambda *args:
+                  logger.error('Error importing diagnostic test results.',
+                               exc_info=True))
+    def import_diagnostics(self):
+        '''
+        Import JSON test results files from diagnostics results directory
+        into :attr:`diagnostics_store`.
+
+        Imported files are moved to the ``imported`` sub-directory.
+
+        .. versionadded:: 0.17
+        '''
+        results_dir = ph.path(self.diagnostics_results_dir)
+        json_paths = results_dir.files('results-*.json')
+        if not json_paths:
+            logger.info('No diagnostic test results files to import.')
+            return
+        imported = self.diagnostics_store.import_json(json_paths)
+        if not imported:
+            return
+        imported_dir = results_dir.joinpath('imported')
+        imported_dir.makedirs_p()
+        # Files that could not be imported are left in place.
+        for json_path in imported:
+            json_path.move(imported_dir.joinpath(json_path.name))
+
+    def _on_diagnostics_progress(self, run, test_name):
+        '''
+        .. versionadded:: 0.17
+        '''
+        if test_name in run.results:
+            self._cache_diagnostics({test_name: run.results[test_name]})
+        logger.info('Diagnostic test `%s` %s (%d/%d).', test_name,
+                    'failed' if test_name in run.errors else 'completed',
+                    run.completed, len(run.tests))
+
+    def _on_diagnostics_complete(self, run, logs, cached=None):
+        '''
+        Record diagnostic test results and attach them (and any cached
+        results) to each experiment log (i.e., logs created while the tests
+        were running).
+
+        Called in GTK main thread.
+
+        .. versionadded:: 0.17
+        '''
+        cached = cached or {}
+        if run.results:
+            self._store_diagnostics(run.results)
+        results = dict(cached)
+        results.update(run.results)
+        for log in logs:
+            metadata = log.metadata.setdefault(self.name, {})
+            metadata['diagnostic tests'] = \
+                {'results': results, 'cached': sorted(cached),
+                 'errors': {test_i: str(error_i)
+                            for test_i, error_i in run.errors.iteritems()}}
+        logger.info('Diagnostic tests complete (%d failed).', len(run.errors))
+        return False
+
     def get_schedule_requests(self, function_name):
         """
         Returns a list of scheduling requests (i.e., ScheduleRequest
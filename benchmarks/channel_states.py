@@ -0,0 +1,77 @@
+"""
+Compare channel state update throughput of the previous ``pandas`` approach
+(``combine_first`` followed by conversion to a ``numpy`` array) with the
+preallocated :class:`ChannelStateBuffer`.
+
+Usage::
+
+    python benchmarks/channel_states.py [--channels N] [--updates N]
+
+.. versionadded:: 0.17
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.path.pardir))
+from channel_states import ChannelStateBuffer  # noqa: E402
+
+
+def random_updates(channel_count, update_count, max_size=8, seed=0):
+    '''
+    Returns
+    -------
+    list
+        List of ``pandas.Series`` channel state updates, each indexed by
+        (random) channel number.
+    '''
+    random = np.random.RandomState(seed)
+    updates = []
+    for i in xrange(update_count):
+        channels = random.choice(channel_count,
+                                 size=random.randint(1, max_size + 1),
+                                 replace=False)
+        updates.append(pd.Series(random.randint(0, 2, size=channels.size),
+                                 index=channels))
+    return updates
+
+
+def pandas_updates(updates, channel_count):
+    channel_states = pd.Series()
+    for update_i in updates:
+        channel_states = update_i.combine_first(channel_states)
+        states = np.zeros(channel_count, dtype=int)
+        states[channel_states.index.values.tolist()] = channel_states
+
+
+def buffer_updates(updates, channel_count):
+    channel_states = ChannelStateBuffer(channel_count)
+    for update_i in updates:
+        channel_states.update(update_i)
+        states = channel_states.states[:channel_count]
+        channel_states.clear_dirty()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--channels', type=int, default=120)
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    updates = random_updates(args.channels, args.updates)
+    print '%-8s %14s' % ('method', 'updates/s')
+    for name, func in (('pandas', pandas_updates),
+                       ('buffer', buffer_updates)):
+        duration = min(timeit.repeat(lambda: func(updates, args.channels),
+                                     repeat=args.repeat, number=1))
+        print '%-8s %14.0f' % (name, args.updates / duration)
+
+
+if __name__ == '__main__':
+    main()
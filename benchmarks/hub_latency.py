@@ -0,0 +1,109 @@
+"""
+Compare 0MQ hub message latency and idle CPU usage of the ``event`` (file
+descriptor watch) and ``poll`` (10 ms timer) socket processing modes.
+
+Usage::
+
+    python benchmarks/hub_latency.py [--count N] [--period SECONDS]
+
+.. versionadded:: 0.17
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import gobject
+import numpy as np
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.path.pardir))
+from zmq_watch import watch_sockets  # noqa: E402
+
+
+def measure(mode, count, period, idle_duration=2.):
+    '''
+    Parameters
+    ----------
+    mode : str
+        Socket processing mode (``'event'`` or ``'poll'``).
+    count : int
+        Number of messages to publish.
+    period : float
+        Time between published messages (in seconds).
+    idle_duration : float, optional
+        Duration (in seconds) to measure CPU time consumed with no messages.
+
+    Returns
+    -------
+    dict
+        Latencies (in seconds) of received messages and CPU seconds consumed
+        per second while idle.
+    '''
+    ctx = zmq.Context.instance()
+    pub = ctx.socket(zmq.PUB)
+    port = pub.bind_to_random_port('tcp://127.0.0.1')
+    sub = ctx.socket(zmq.SUB)
+    sub.setsockopt(zmq.SUBSCRIBE, '')
+    sub.connect('tcp://127.0.0.1:%d' % port)
+    # Wait for subscription to propagate.
+    time.sleep(.2)
+
+    loop = gobject.MainLoop()
+    latencies = []
+
+    def process():
+        while True:
+            try:
+                sent = float(sub.recv(zmq.NOBLOCK))
+            except zmq.Again:
+                break
+            latencies.append(time.time() - sent)
+            if len(latencies) >= count:
+                loop.quit()
+
+    def publish():
+        for i in xrange(count):
+            time.sleep(period)
+            pub.send(repr(time.time()))
+
+    watcher = watch_sockets([sub], process, mode=mode)
+    try:
+        # Measure CPU time consumed while idle.
+        gobject.timeout_add(int(idle_duration * 1000), loop.quit)
+        cpu_start = time.clock()
+        loop.run()
+        idle_cpu = (time.clock() - cpu_start) / idle_duration
+
+        thread = threading.Thread(target=publish)
+        thread.daemon = True
+        thread.start()
+        loop.run()
+        thread.join()
+    finally:
+        watcher.stop()
+        sub.close()
+        pub.close()
+    return {'latencies': np.array(latencies), 'idle_cpu': idle_cpu}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--period', type=float, default=.005)
+    args = parser.parse_args(argv)
+
+    print '%-6s %10s %10s %10s %12s' % ('mode', 'mean (ms)', 'p99 (ms)',
+                                        'max (ms)', 'idle CPU (%)')
+    for mode in ('poll', 'event'):
+        result = measure(mode, args.count, args.period)
+        latencies_ms = 1e3 * result['latencies']
+        print '%-6s %10.3f %10.3f %10.3f %12.2f' % \
+            (mode, latencies_ms.mean(), np.percentile(latencies_ms, 99),
+             latencies_ms.max(), 100 * result['idle_cpu'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Measure worst-case latency from a pause request to high-voltage output being
+turned off while the hardware I/O worker is busy with telemetry and bulk
+commands.
+
+A simulated control board is used, where each command takes a configurable
+time.  With priority lanes, the latency of the safety command must not exceed
+the duration of the longest single command (plus scheduling overhead), and
+high-voltage output must still be off once all queued commands have completed
+(i.e., a step write queued before the pause must not turn it back on).
+
+Usage::
+
+    python benchmarks/safety_latency.py [--trials N]
+
+.. versionadded:: 0.17
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.path.pardir))
+from board_worker import (BoardWorker, PRIORITY_BULK,  # noqa: E402
+                          PRIORITY_INTERACTIVE, PRIORITY_SAFETY,
+                          PRIORITY_TELEMETRY)
+
+
+class SimulatedBoard(object):
+    def __init__(self, command_duration=.01, bulk_duration=.05):
+        self.command_duration = command_duration
+        self.bulk_duration = bulk_duration
+        self.hv_output_enabled = True
+
+    def measure_capacitance(self):
+        time.sleep(self.command_duration)
+        return 0.
+
+    def run_test(self):
+        time.sleep(self.bulk_duration)
+
+    def apply_step(self):
+        time.sleep(self.command_duration)
+        self.hv_output_enabled = True
+
+
+def measure(worker, board, telemetry_count=20, bulk_count=5):
+    '''
+    Queue telemetry, bulk and step write commands, then turn off high-voltage
+    output (cancelling pending step writes, as
+    :meth:`DropBotPlugin.disable_hv_output` does).
+
+    Returns
+    -------
+    tuple
+        Time (in seconds) from submitting safety command to its completion,
+        and high-voltage output state once all queued commands completed.
+    '''
+    futures = []
+    board.hv_output_enabled = True
+    for i in xrange(bulk_count):
+        futures.append(worker.submit('test', board.run_test))
+    for i in xrange(telemetry_count):
+        futures.append(worker.submit('measure_capacitance',
+                                     board.measure_capacitance))
+    # Let the worker start executing a command.
+    time.sleep(.001)
+    # Step write queued while the worker is busy.
+    futures.append(worker.submit('apply_step', board.apply_step))
+    start = time.time()
+    worker.cancel_pending(PRIORITY_INTERACTIVE, commands=('apply_step', ))
+    worker.call('disable_hv_output', setattr, board, 'hv_output_enabled',
+                False)
+    latency = time.time() - start
+    for future in futures:
+        # Wait without raising exception (e.g., cancelled step write).
+        future.exception()
+    return latency, board.hv_output_enabled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--trials', type=int, default=20)
+    parser.add_argument('--bulk-duration', type=float, default=.05)
+    parser.add_argument('--tolerance', type=float, default=.01,
+                        help='Allowed scheduling overhead (seconds).')
+    args = parser.parse_args(argv)
+
+    board = SimulatedBoard(bulk_duration=args.bulk_duration)
+    print '%-10s %10s %10s' % ('mode', 'mean (ms)', 'max (ms)')
+    results = {}
+    for mode in ('fifo', 'priority'):
+        worker = BoardWorker()
+        if mode == 'priority':
+            worker.priorities.update({'disable_hv_output': PRIORITY_SAFETY,
+                                      'measure_capacitance':
+                                      PRIORITY_TELEMETRY,
+                                      'test': PRIORITY_BULK})
+        worker.start()
+        try:
+            latencies, hv_states = \
+                np.array([measure(worker, board)
+                          for i in xrange(args.trials)]).T
+        finally:
+            worker.stop()
+        results[mode] = latencies
+        assert not hv_states.any(), \
+            ('High-voltage output turned back on after HV-off in %d/%d '
+             'trials (%s).' % (hv_states.sum(), args.trials, mode))
+        print '%-10s %10.2f %10.2f' % (mode, 1e3 * latencies.mean(),
+                                       1e3 * latencies.max())
+
+    worst_case = results['priority'].max()
+    assert worst_case <= args.bulk_duration + args.tolerance, \
+        ('Worst-case pause to HV-off latency (%.1f ms) exceeds longest '
+         'command duration (%.1f ms).' % (1e3 * worst_case,
+                                          1e3 * args.bulk_duration))
+
+
+if __name__ == '__main__':
+    main()
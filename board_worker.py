@@ -0,0 +1,416 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Serialized control board access from a single hardware I/O thread.
+
+.. versionadded:: 0.17
+"""
+from collections import defaultdict
+import itertools
+import logging
+import Queue
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+#: Priority of commands that make the hardware safe (e.g., turn off
+#: high-voltage output).  Lower values are executed first.
+PRIORITY_SAFETY = 0
+#: Default command priority.
+PRIORITY_INTERACTIVE = 10
+#: Priority of periodic measurements (e.g., capacitance, voltage).
+PRIORITY_TELEMETRY = 20
+#: Priority of long-running bulk work (e.g., diagnostic tests).
+PRIORITY_BULK = 30
+
+
+class CancelledError(Exception):
+    pass
+
+
+class Future(object):
+    '''
+    Result of a command submitted to a :class:`BoardWorker`.
+    '''
+    def __init__(self, command):
+        self.command = command
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.is_set()
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_exception(self, exc_info):
+        '''
+        Parameters
+        ----------
+        exc_info : tuple
+            Exception info, as returned by :func:`sys.exc_info`.
+        '''
+        self._exc_info = exc_info
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self._run_callback(callback)
+
+    def _run_callback(self, callback):
+        try:
+            callback(self)
+        except Exception:
+            logger.error('Error in `%s` done callback.', self.command,
+                         exc_info=True)
+
+    def add_done_callback(self, callback):
+        '''
+        Call :data:`callback` with future as soon as it is done.
+
+        If the future is already done, :data:`callback` is called immediately
+        (in the calling thread); otherwise, it is called from the worker
+        thread.
+        '''
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        self._run_callback(callback)
+
+    def exception(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise RuntimeError('Timed out waiting for `%s`.' % self.command)
+        return self._exc_info[1] if self._exc_info else None
+
+    def result(self, timeout=None):
+        '''
+        Wait for command to complete.
+
+        Returns
+        -------
+        object
+            Return value of command.
+
+        Raises
+        ------
+        Exception
+            Exception raised by command (re-raised with original traceback).
+        RuntimeError
+            If :data:`timeout` elapses before command completes.
+        '''
+        if not self._done.wait(timeout):
+            raise RuntimeError('Timed out waiting for `%s`.' % self.command)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class CommandStats(object):
+    '''
+    Queue wait and round-trip times of completed commands, by command type.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'count': 0, 'errors': 0,
+                                           'wait_total': 0., 'wait_max': 0.,
+                                           'rtt_total': 0., 'rtt_max': 0.})
+
+    def record(self, command, wait, rtt, error=False):
+        with self._lock:
+            stats = self._stats[command]
+            stats['count'] += 1
+            stats['errors'] += int(error)
+            stats['wait_total'] += wait
+            stats['wait_max'] = max(stats['wait_max'], wait)
+            stats['rtt_total'] += rtt
+            stats['rtt_max'] = max(stats['rtt_max'], rtt)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self):
+        '''
+        Returns
+        -------
+        dict
+            Count, error count, and mean/maximum queue wait and round-trip
+            times (in seconds) for each command type.
+        '''
+        with self._lock:
+            summary = {}
+            for command, stats in self._stats.iteritems():
+                count = stats['count']
+                summary[command] = {'count': count,
+                                    'errors': stats['errors'],
+                                    'wait_mean': stats['wait_total'] / count,
+                                    'wait_max': stats['wait_max'],
+                                    'rtt_mean': stats['rtt_total'] / count,
+                                    'rtt_max': stats['rtt_max']}
+            return summary
+
+
+class BoardWorker(object):
+    '''
+    Thread that executes all control board commands, one at a time.
+
+    Pending commands are executed in order of priority (see
+    :attr:`priorities`), and in the order they were submitted within the same
+    priority.  A command that is already executing is never interrupted, so
+    the worst-case latency of a :data:`PRIORITY_SAFETY` command is the
+    duration of the longest single command.
+
+    Parameters
+    ----------
+    name : str, optional
+        Name of worker thread.
+
+    Attributes
+    ----------
+    stats : CommandStats
+        Queue wait and round-trip times by command type.
+    priorities : dict
+        Priority of each command type.  Command types that are not listed
+        have priority :data:`PRIORITY_INTERACTIVE`.
+    '''
+    def __init__(self, name='dropbot-io'):
+        self.name = name
+        self.stats = CommandStats()
+        self.priorities = {}
+        self._queue = Queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_worker_thread(self):
+        return threading.current_thread() is self._thread
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        '''
+        Stop worker thread after all previously submitted commands complete.
+        '''
+        if not self.running:
+            return
+        # Queue stop request after all pending commands.
+        self._queue.put((sys.maxint, next(self._sequence), None))
+        if not self.in_worker_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, command, func, *args, **kwargs):
+        '''
+        Queue function call for execution in worker thread.
+
+        Parameters
+        ----------
+        command : str
+            Command type (used for priority, statistics and logging).
+        func : callable
+            Function to call.
+        *args, **kwargs
+            Arguments to pass to :data:`func`.
+
+        Returns
+        -------
+        Future
+            Result of function call.
+        '''
+        if self.in_worker_thread():
+            # Execute immediately to avoid deadlock if a command submits
+            # another command and waits for the result.
+            future = Future(command)
+            self._execute(future, func, args, kwargs, time.time())
+            return future
+        return self.queue(command, func, *args, **kwargs)
+
+    def queue(self, command, func, *args, **kwargs):
+        '''
+        Queue function call for execution in worker thread, even if called
+        from the worker thread (e.g., from a :class:`Future` done callback),
+        i.e., pending commands with a higher priority are executed first.
+
+        Must not be waited on from the worker thread.  See :meth:`submit`.
+        '''
+        if not self.running:
+            raise RuntimeError('Board worker is not running.')
+        future = Future(command)
+        priority = self.priorities.get(command, PRIORITY_INTERACTIVE)
+        self._queue.put((priority, next(self._sequence),
+                         (future, func, args, kwargs, time.time())))
+        return future
+
+    def cancel_pending(self, priority=PRIORITY_TELEMETRY, commands=None):
+        '''
+        Cancel pending commands with the specified priority or lower (i.e.,
+        a priority value greater than or equal to :data:`priority`).
+
+        Each cancelled command fails with :class:`CancelledError`.
+
+        Parameters
+        ----------
+        priority : int, optional
+            Highest priority of commands to cancel.
+        commands : list, optional
+            If specified, only cancel commands of these types.
+
+        Returns
+        -------
+        int
+            Number of cancelled commands.
+        '''
+        kept = []
+        cancelled = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except Queue.Empty:
+                break
+            if (entry[2] is not None and entry[0] >= priority and
+                    (commands is None or entry[2][0].command in commands)):
+                cancelled.append(entry[2][0])
+            else:
+                kept.append(entry)
+        for entry in kept:
+            self._queue.put(entry)
+        for future in cancelled:
+            future.set_exception((CancelledError,
+                                  CancelledError('`%s` cancelled.' %
+                                                 future.command), None))
+        return len(cancelled)
+
+    def call(self, command, func, *args, **kwargs):
+        '''
+        Execute function call in worker thread and wait for result.
+
+        See :meth:`submit`.
+        '''
+        return self.submit(command, func, *args, **kwargs).result()
+
+    def _execute(self, future, func, args, kwargs, submitted):
+        start = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            end = time.time()
+            self.stats.record(future.command, start - submitted, end - start,
+                              error=True)
+            future.set_exception(sys.exc_info())
+        else:
+            end = time.time()
+            self.stats.record(future.command, start - submitted, end - start)
+            future.set_result(result)
+
+    def _run(self):
+        while True:
+            priority, sequence, item = self._queue.get()
+            if item is None:
+                break
+            self._execute(*item)
+
+
+class BoardProxy(object):
+    '''
+    Wrapper around a control board driver (e.g., :class:`dropbot.SerialProxy`)
+    that executes every attribute access and method call in the thread of a
+    :class:`BoardWorker`.
+
+    Attribute reads, attribute writes and method calls block until executed
+    by the worker.  Use :meth:`submit_job` to queue a call without blocking.
+
+    Parameters
+    ----------
+    worker : BoardWorker
+        Worker that executes control board commands.
+    board : object
+        Control board driver.
+    '''
+    def __init__(self, worker, board):
+        object.__setattr__(self, '_worker', worker)
+        object.__setattr__(self, '_board', board)
+
+    def _method(self, name):
+        board = self._board
+        worker = self._worker
+
+        def _call(*args, **kwargs):
+            return worker.call(name, lambda: getattr(board, name)(*args,
+                                                                  **kwargs))
+        _call.__name__ = name
+        return _call
+
+    def __getattr__(self, name):
+        if callable(getattr(type(self._board), name, None)):
+            return self._method(name)
+        board = self._board
+        return self._worker.call(name, getattr, board, name)
+
+    def __setattr__(self, name, value):
+        self._worker.call(name + '=', setattr, self._board, name, value)
+
+    def submit_job(self, command, func, *args, **kwargs):
+        '''
+        Queue call to ``func(board, *args, **kwargs)`` in worker thread.
+
+        Returns
+        -------
+        Future
+            Result of function call.
+        '''
+        return self._worker.submit(command, func, self._board, *args,
+                                   **kwargs)
+
+    def queue_job(self, command, func, *args, **kwargs):
+        '''
+        Queue call to ``func(board, *args, **kwargs)`` in worker thread, even
+        if called from the worker thread (see :meth:`BoardWorker.queue`).
+
+        Returns
+        -------
+        Future
+            Result of function call.
+        '''
+        return self._worker.queue(command, func, self._board, *args,
+                                  **kwargs)
+
+    def run_job(self, command, func, *args, **kwargs):
+        '''
+        Execute ``func(board, *args, **kwargs)`` in worker thread (e.g., to
+        run several commands without other commands interleaved) and wait for
+        result.
+        '''
+        return self.submit_job(command, func, *args, **kwargs).result()
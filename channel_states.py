@@ -0,0 +1,285 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+.. versionadded:: 0.17
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+#: Number of channels per switching board.
+SWITCHING_BOARD_CHANNELS = 40
+
+
+class ChannelStateBuffer(object):
+    '''
+    Preallocated actuation state of each control board channel.
+
+    Updates are applied in place by channel number and the modified channels
+    are tracked in a dirty mask until :meth:`clear_dirty` is called.
+
+    Parameters
+    ----------
+    size : int, optional
+        Number of channels.
+    dtype : numpy.dtype, optional
+        Data type of channel states.
+
+    Attributes
+    ----------
+    states : numpy.ndarray
+        Actuation state of each channel.  All channels default to off.
+    dirty : numpy.ndarray
+        Boolean mask of channels modified since last call to
+        :meth:`clear_dirty`.
+    '''
+    def __init__(self, size=0, dtype=int):
+        self.states = np.zeros(size, dtype=dtype)
+        self.dirty = np.zeros(size, dtype=bool)
+
+    def __len__(self):
+        return self.states.size
+
+    @property
+    def size(self):
+        return self.states.size
+
+    def resize(self, size):
+        '''
+        Resize buffer to specified number of channels.
+
+        States of existing channels (up to the new size) are preserved.  Added
+        channels are off.
+
+        Parameters
+        ----------
+        size : int
+            Number of channels.
+        '''
+        if size == self.states.size:
+            return
+        states = np.zeros(size, dtype=self.states.dtype)
+        dirty = np.zeros(size, dtype=bool)
+        count = min(size, self.states.size)
+        states[:count] = self.states[:count]
+        dirty[:count] = self.dirty[:count]
+        self.states = states
+        self.dirty = dirty
+
+    def update(self, channel_states):
+        '''
+        Update state of specified channels in place.
+
+        The buffer is grown if any channel number exceeds the current size.
+
+        Parameters
+        ----------
+        channel_states : pandas.Series or dict
+            Actuation state of each channel to update, keyed by channel
+            number.
+
+        Raises
+        ------
+        ValueError
+            If any channel number is not a non-negative integer.
+        '''
+        if hasattr(channel_states, 'index'):
+            channels = np.asarray(channel_states.index, dtype=int)
+            values = np.asarray(channel_states.values)
+        else:
+            channels = np.fromiter(channel_states.iterkeys(), dtype=int,
+                                   count=len(channel_states))
+            values = np.fromiter(channel_states.itervalues(),
+                                 dtype=self.states.dtype,
+                                 count=len(channel_states))
+        self.update_indexed(channels, values)
+
+    def update_indexed(self, channels, values):
+        '''
+        Update state of specified channels in place.
+
+        Parameters
+        ----------
+        channels : numpy.ndarray
+            Integer channel numbers.
+        values : numpy.ndarray or scalar
+            Actuation state of each channel in :data:`channels`.
+
+        Raises
+        ------
+        ValueError
+            If any channel number is negative.
+        '''
+        if not len(channels):
+            return
+        if channels.min() < 0:
+            raise ValueError('Channel numbers must be non-negative.')
+        max_channel = channels.max()
+        if max_channel >= self.states.size:
+            self.resize(max_channel + 1)
+        self.states[channels] = values
+        self.dirty[channels] = True
+
+    def assign(self, states):
+        '''
+        Replace state of all channels (e.g., with precompiled step channel
+        states).
+
+        Only channels whose state changes are marked as modified.
+
+        Parameters
+        ----------
+        states : numpy.ndarray
+            Actuation state of each channel.  Channels beyond the length of
+            :data:`states` are turned off.
+        '''
+        if states.size > self.states.size:
+            self.resize(states.size)
+        new_states = np.zeros_like(self.states)
+        new_states[:states.size] = states
+        self.dirty |= new_states != self.states
+        self.states[:] = new_states
+
+    def clear(self):
+        '''
+        Turn off all channels (and mark them as modified).
+        '''
+        self.states[:] = 0
+        self.dirty[:] = True
+
+    def clear_dirty(self):
+        self.dirty[:] = False
+
+    def dirty_channels(self):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Channel numbers modified since last call to :meth:`clear_dirty`.
+        '''
+        return np.flatnonzero(self.dirty)
+
+    def to_series(self):
+        '''
+        Returns
+        -------
+        pandas.Series
+            Actuation state of each channel, indexed by channel number.
+        '''
+        return pd.Series(self.states, name='channels')
+
+
+class ChannelUpdate(namedtuple('ChannelUpdate', 'form changed costs')):
+    '''
+    Channel state update plan (see :func:`plan_channel_update`).
+
+    Attributes
+    ----------
+    form : str
+        Cheapest supported update form.
+    changed : numpy.ndarray
+        Channel numbers whose state changed.
+    costs : dict
+        Payload size (in bytes) of each update form.
+    '''
+    __slots__ = ()
+
+    @property
+    def nbytes(self):
+        return self.costs[self.form]
+
+
+def changed_channels(previous, states):
+    '''
+    Parameters
+    ----------
+    previous : numpy.ndarray
+        Previously applied state of each channel, or ``None`` if not known.
+    states : numpy.ndarray
+        New state of each channel.
+
+    Returns
+    -------
+    numpy.ndarray
+        Channel numbers whose state changed (all channels if previous states
+        are not known).
+    '''
+    if previous is None or previous.size != states.size:
+        return np.arange(states.size)
+    # XOR packed states, i.e., 8 channels per byte.
+    changed = np.bitwise_xor(np.packbits(previous.astype(bool)),
+                             np.packbits(states.astype(bool)))
+    return np.flatnonzero(np.unpackbits(changed)[:states.size])
+
+
+def update_costs(changed, channel_count, bank_size=SWITCHING_BOARD_CHANNELS):
+    '''
+    Payload size of each form of channel state update.
+
+    Parameters
+    ----------
+    changed : numpy.ndarray
+        Channel numbers whose state changed.
+    channel_count : int
+        Number of channels.
+    bank_size : int, optional
+        Number of channels per switching board.
+
+    Returns
+    -------
+    dict
+        Payload size (in bytes) of ``full`` update (packed states of all
+        channels), ``bank`` update (index and packed states of each switching
+        board with a changed channel), and ``changed`` update (16-bit channel
+        number and state of each changed channel).
+    '''
+    bank_count = np.unique(changed // bank_size).size
+    return {'full': (channel_count + 7) // 8,
+            'bank': bank_count * (1 + (bank_size + 7) // 8),
+            'changed': 3 * changed.size}
+
+
+def plan_channel_update(previous, states, forms=('full', ),
+                        bank_size=SWITCHING_BOARD_CHANNELS):
+    '''
+    Select the cheapest form of update from previous to new channel states.
+
+    Parameters
+    ----------
+    previous : numpy.ndarray
+        Previously applied state of each channel, or ``None`` if not known.
+    states : numpy.ndarray
+        New state of each channel.
+    forms : tuple, optional
+        Update forms supported by the control board (see
+        :func:`update_costs`).
+    bank_size : int, optional
+        Number of channels per switching board.
+
+    Returns
+    -------
+    ChannelUpdate
+        Update plan, or ``None`` if no channel state changed.
+    '''
+    changed = changed_channels(previous, states)
+    if not changed.size:
+        return None
+    costs = update_costs(changed, states.size, bank_size=bank_size)
+    form = min(forms, key=costs.get)
+    return ChannelUpdate(form, changed, costs)
@@ -0,0 +1,99 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+.. versionadded:: 0.17
+"""
+from collections import namedtuple
+
+
+_DEVICE_INFO_FIELDS = ('display_name', 'package_name', 'software_version',
+                       'hardware_version', 'number_of_channels', 'id', 'uuid',
+                       'port', 'max_waveform_voltage',
+                       'min_waveform_frequency', 'max_waveform_frequency',
+                       'host_package_name', 'host_software_version',
+                       'remote_software_version')
+
+
+class DeviceInfo(namedtuple('DeviceInfo', _DEVICE_INFO_FIELDS)):
+    '''
+    Immutable snapshot of control board properties that do not change while
+    connected.
+
+    Attributes
+    ----------
+    display_name : str
+        Device display name (e.g., ``"DropBot"``).
+    package_name : str
+        Firmware package name.
+    software_version : str
+        Firmware version.
+    hardware_version : str
+        Hardware version.
+    number_of_channels : int
+        Number of switching board channels.
+    id : str
+        Device id.
+    uuid : str
+        Device UUID.
+    port : str
+        Serial port.
+    max_waveform_voltage : float
+        Maximum waveform voltage (in V).
+    min_waveform_frequency : float
+        Minimum waveform frequency (in Hz).
+    max_waveform_frequency : float
+        Maximum waveform frequency (in Hz).
+    host_package_name : str
+        Host driver package name.
+    host_software_version : str
+        Host driver version.
+    remote_software_version : str
+        Firmware version reported by the device.
+    '''
+    __slots__ = ()
+
+    @classmethod
+    def from_board(cls, board):
+        '''
+        Read device properties from control board.
+
+        Parameters
+        ----------
+        board : dropbot.SerialProxy
+            Connected control board.
+
+        Returns
+        -------
+        DeviceInfo
+        '''
+        properties = board.properties
+        return cls(display_name=properties['display_name'],
+                   package_name=properties['package_name'],
+                   software_version=properties['software_version'],
+                   hardware_version=board.hardware_version,
+                   number_of_channels=int(board.number_of_channels),
+                   id=board.id,
+                   uuid=str(board.uuid),
+                   port=board.port,
+                   max_waveform_voltage=float(board.max_waveform_voltage),
+                   min_waveform_frequency=float(board.min_waveform_frequency),
+                   max_waveform_frequency=float(board.max_waveform_frequency),
+                   host_package_name=board.host_package_name,
+                   host_software_version=str(board.host_software_version),
+                   remote_software_version=str(board
+                                               .remote_software_version))
@@ -0,0 +1,193 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Background execution of DropBot diagnostic tests.
+
+.. versionadded:: 0.17
+"""
+import logging
+import threading
+
+import dropbot as db
+import dropbot.hardware_test
+
+from .board_worker import CancelledError
+
+logger = logging.getLogger(__name__)
+
+
+class DiagnosticsRunner(object):
+    '''
+    Run DropBot diagnostic tests (see :mod:`dropbot.hardware_test`) as
+    background control board jobs.
+
+    Each test is executed as a single job by the hardware I/O worker, i.e.,
+    with exclusive access to the control board for the duration of the test
+    only.  Other commands (e.g., protocol step writes) may be executed
+    between tests.
+
+    Tests are submitted one at a time, such that no more than one test is
+    queued ahead of other commands.  Tests that have not been submitted may be
+    deferred using :meth:`pause` (e.g., while a protocol is running).
+
+    Parameters
+    ----------
+    board : board_worker.BoardProxy
+        Control board.
+    tests : list
+        Names of tests to run, in order.
+    on_progress : callable, optional
+        Called as ``on_progress(runner, test_name)`` (from the worker thread)
+        after each test.
+    on_complete : callable, optional
+        Called as ``on_complete(runner)`` (from the worker thread) after all
+        tests.
+    after_test : callable, optional
+        Called (without arguments, from the worker thread) after each test,
+        e.g., to invalidate cached control board state.
+
+    Attributes
+    ----------
+    results : dict
+        Results of completed tests, by test name.
+    errors : dict
+        Exceptions raised by failed tests, by test name.
+    paused : bool
+        ``True`` if remaining tests are deferred (see :meth:`pause`).
+    '''
+    def __init__(self, board, tests, on_progress=None, on_complete=None,
+                 after_test=None):
+        self.board = board
+        self.tests = list(tests)
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.after_test = after_test
+        self.results = {}
+        self.errors = {}
+        self.futures = {}
+        self.paused = False
+        # Set once each test has completed.
+        self._done_events = {test_name: threading.Event()
+                             for test_name in self.tests}
+        # Index of next test to submit.
+        self._next = 0
+        self._running = False
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    @property
+    def completed(self):
+        return len(self.results) + len(self.errors)
+
+    def done(self):
+        return self.completed == len(self.tests)
+
+    def start(self):
+        if not self.tests and self.on_complete is not None:
+            # Nothing to run.
+            self.on_complete(self)
+        self._submit_next()
+        return self
+
+    def pause(self):
+        '''
+        Defer remaining tests (a test that is already running is completed).
+        '''
+        with self._lock:
+            self.paused = True
+
+    def resume(self):
+        '''
+        Resume remaining tests.
+        '''
+        with self._lock:
+            self.paused = False
+        self._submit_next()
+
+    def _submit_next(self):
+        with self._lock:
+            if (self.paused or self._running or self._cancelled or
+                    self._next >= len(self.tests)):
+                return
+            test_name = self.tests[self._next]
+            self._next += 1
+            self._running = True
+        # Always queue (rather than execute immediately when called from the
+        # worker thread after the previous test), such that other commands
+        # may be executed between tests.
+        future = self.board.queue_job(test_name, self._run_test, test_name)
+        self.futures[test_name] = future
+        future.add_done_callback(self._on_test_done)
+
+    def _run_test(self, board, test_name):
+        test_func = getattr(db.hardware_test, test_name)
+        try:
+            return test_func(board)
+        finally:
+            if self.after_test is not None:
+                self.after_test()
+
+    def _on_test_done(self, future):
+        test_name = future.command
+        exception = future.exception()
+        with self._lock:
+            if exception is None:
+                self.results[test_name] = future.result()
+            else:
+                self.errors[test_name] = exception
+            self._running = False
+            if isinstance(exception, CancelledError):
+                # Pending commands cancelled (e.g., on app exit); do not run
+                # remaining tests.
+                self._cancelled = True
+            done = self.done()
+        self._done_events[test_name].set()
+        if self._cancelled:
+            for event in self._done_events.itervalues():
+                # Do not wait for remaining tests.
+                event.set()
+        if exception is not None:
+            logger.error('Error running diagnostic test `%s`: %s', test_name,
+                         exception)
+        if self.on_progress is not None:
+            self.on_progress(self, test_name)
+        if done and self.on_complete is not None:
+            self.on_complete(self)
+        self._submit_next()
+
+    def wait(self, tests=None, timeout=None):
+        '''
+        Wait for tests to complete.
+
+        Parameters
+        ----------
+        tests : list, optional
+            Names of tests to wait for (default: all tests).
+        timeout : float, optional
+            Maximum time (in seconds) to wait for *each* test.
+
+        Raises
+        ------
+        RuntimeError
+            If :data:`timeout` elapses before a test completes.
+        '''
+        for test_name in (self.tests if tests is None else tests):
+            event = self._done_events.get(test_name)
+            if event is not None and not event.wait(timeout):
+                raise RuntimeError('Timed out waiting for diagnostic test '
+                                   '`%s`.' % test_name)
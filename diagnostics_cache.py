@@ -0,0 +1,140 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Cache of recent diagnostic test results.
+
+.. versionadded:: 0.17
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#: Maximum RMS error of measured voltages (relative to target voltages) of a
+#: passing ``test_voltage`` result.
+VOLTAGE_RMS_ERROR_TOLERANCE = .1
+
+
+def test_passed(test_name, result):
+    '''
+    Parameters
+    ----------
+    test_name : str
+        Test name (see :mod:`dropbot.hardware_test`).
+    result : dict
+        Test result.
+
+    Returns
+    -------
+    bool
+        ``True`` if test result indicates no hardware problem, e.g.,
+        ``test_shorts`` found no shorts and ``test_voltage`` measured voltages
+        are within :data:`VOLTAGE_RMS_ERROR_TOLERANCE` of target voltages.
+    '''
+    if not isinstance(result, dict) or result.get('error'):
+        return False
+    if test_name == 'test_shorts':
+        return not len(result.get('shorts', []))
+    if test_name == 'test_voltage':
+        try:
+            target = np.asarray(result['target_voltage'], dtype=float)
+            measured = np.asarray(result['measured_voltage'], dtype=float)
+            error = (measured - target)[target > 0] / target[target > 0]
+        except Exception:
+            return False
+        return bool(error.size and np.sqrt(np.mean(error ** 2)) <=
+                    VOLTAGE_RMS_ERROR_TOLERANCE)
+    return True
+
+
+class DiagnosticsCache(object):
+    '''
+    Results of successful diagnostic tests, keyed by DropBot UUID, firmware
+    version and test name.
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Time (in seconds) a result is considered fresh.  If ``0``, no results
+        are fresh (i.e., caching is disabled).
+    '''
+    def __init__(self, ttl=600.):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def store(self, uuid, software_version, test_name, result):
+        '''
+        Record result of a successful test.
+        '''
+        with self._lock:
+            self._entries[(str(uuid), software_version, test_name)] = \
+                (time.time(), result)
+
+    def get(self, uuid, software_version, test_name):
+        '''
+        Returns
+        -------
+        tuple
+            Age (in seconds) and result of test, or ``None`` if no fresh
+            result is cached.
+        '''
+        key = (str(uuid), software_version, test_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.time() - entry[0]
+            if age >= self.ttl:
+                # Stale result.
+                del self._entries[key]
+                return None
+            return age, entry[1]
+
+    def fresh(self, uuid, software_version, tests):
+        '''
+        Returns
+        -------
+        dict
+            Fresh cached result of each of :data:`tests` (tests without a
+            fresh result are omitted), by test name.
+        '''
+        results = {}
+        for test_name in tests:
+            entry = self.get(uuid, software_version, test_name)
+            if entry is not None:
+                logger.debug('Using cached `%s` result (%.0f s old).',
+                             test_name, entry[0])
+                results[test_name] = entry[1]
+        return results
+
+    def invalidate(self, uuid=None):
+        '''
+        Remove cached results (of all boards, or of board with specified
+        UUID).
+        '''
+        with self._lock:
+            if uuid is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries
+                            if key[0] == str(uuid)]:
+                    del self._entries[key]
@@ -0,0 +1,357 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Append-only HDF5 store of diagnostic test results.
+
+Each test result is appended as a row of the ``/index`` table (indexed by
+DropBot UUID, test name and timestamp), with the result itself stored under
+``/results/r<row>``: dictionaries as groups, numeric arrays as HDF5 arrays,
+and any other values as pickled objects (i.e., variable length arrays of
+:class:`tables.ObjectAtom`; unlike node attributes, not limited to 64 KiB).
+
+Existing JSON results files (e.g., written by
+:func:`dropbot.hardware_test.log_results`) may be imported from the command
+line::
+
+    python diagnostics_store.py .dropbot-diagnostics/diagnostics.h5 \\
+        .dropbot-diagnostics/*.json
+
+.. versionadded:: 0.17
+"""
+import calendar
+import datetime as dt
+import logging
+import re
+import threading
+import time
+
+import json_tricks
+import numpy as np
+import pandas as pd
+import path_helpers as ph
+import tables
+
+logger = logging.getLogger(__name__)
+
+
+class ResultRow(tables.IsDescription):
+    uuid = tables.StringCol(36, pos=0)
+    test_name = tables.StringCol(64, pos=1)
+    #: POSIX timestamp (UTC).
+    timestamp = tables.Float64Col(pos=2)
+    software_version = tables.StringCol(32, pos=3)
+    #: Index of result group (i.e., ``/results/r<result>``).
+    result = tables.Int64Col(pos=4)
+
+
+def _to_timestamp(value):
+    '''
+    Convert :class:`datetime.datetime` (UTC) to POSIX timestamp.
+    '''
+    if isinstance(value, dt.datetime):
+        return calendar.timegm(value.utctimetuple()) + 1e-6 * value.microsecond
+    return value
+
+
+def _write_value(h5f, parent, name, value):
+    if isinstance(value, dict) and all(isinstance(key, basestring) and
+                                       '/' not in key for key in value):
+        group = h5f.create_group(parent, name)
+        for key, value_i in value.iteritems():
+            _write_value(h5f, group, key, value_i)
+        return
+    if isinstance(value, (np.ndarray, list, tuple)):
+        try:
+            array = np.asarray(value)
+        except Exception:
+            array = None
+        if (array is not None and array.dtype.kind in 'biuf' and
+                array.size):
+            h5f.create_array(parent, name, array)
+            return
+    # Other values (e.g., strings, scalars, lists of dictionaries) are
+    # pickled, since node attributes are limited to 64 KiB.
+    h5f.create_vlarray(parent, name, tables.ObjectAtom()).append(value)
+
+
+def _read_group(group):
+    # Values stored as attributes (i.e., by earlier versions).
+    data = {name: group._v_attrs[name]
+            for name in group._v_attrs._f_list('user')}
+    for node in group._f_iter_nodes():
+        if isinstance(node, tables.Group):
+            data[node._v_name] = _read_group(node)
+        elif (isinstance(node, tables.VLArray) and
+              isinstance(node.atom, tables.ObjectAtom)):
+            data[node._v_name] = node.read()[0]
+        else:
+            data[node._v_name] = node.read()
+    return data
+
+
+class DiagnosticsStore(object):
+    '''
+    Append-only HDF5 store of diagnostic test results.
+
+    The file is only opened for the duration of each operation.
+
+    Parameters
+    ----------
+    path : str
+        Path of HDF5 file.
+    '''
+    def __init__(self, path):
+        self.path = ph.path(path)
+        self._lock = threading.RLock()
+
+    def _open(self, mode='r'):
+        if mode != 'r':
+            self.path.parent.makedirs_p()
+        h5f = tables.open_file(self.path, mode)
+        if mode != 'r' and '/index' not in h5f:
+            table = h5f.create_table('/', 'index', ResultRow,
+                                     'Diagnostic test results')
+            for column in ('uuid', 'test_name', 'timestamp'):
+                table.cols._f_col(column).create_index()
+            h5f.create_group('/', 'results')
+        return h5f
+
+    def append(self, uuid, results, timestamp=None, software_version=''):
+        '''
+        Append test results.
+
+        Parameters
+        ----------
+        uuid : str
+            DropBot UUID.
+        results : dict
+            Result of each test, by test name.
+        timestamp : datetime.datetime or float, optional
+            Time of tests (UTC; default: now).
+        software_version : str, optional
+            DropBot firmware version.
+
+        Returns
+        -------
+        list
+            Index of result group of each appended test.
+        '''
+        timestamp = time.time() if timestamp is None else \
+            _to_timestamp(timestamp)
+        indexes = []
+        with self._lock:
+            h5f = self._open('a')
+            try:
+                table = h5f.root.index
+                # Skip any result groups left by an interrupted append.
+                start = max(table.nrows, h5f.root.results._v_nchildren)
+                for i, (test_name, result) in \
+                        enumerate(sorted(results.iteritems())):
+                    index = start + i
+                    _write_value(h5f, h5f.root.results, 'r%d' % index,
+                                 {'result': result})
+                    row = table.row
+                    row['uuid'] = str(uuid or '')
+                    row['test_name'] = test_name
+                    row['timestamp'] = timestamp
+                    row['software_version'] = str(software_version or '')
+                    row['result'] = index
+                    row.append()
+                    indexes.append(index)
+                table.flush()
+            finally:
+                h5f.close()
+        return indexes
+
+    def query(self, uuid=None, test_name=None, start=None, end=None):
+        '''
+        Look up results using the table indexes.
+
+        Parameters
+        ----------
+        uuid : str, optional
+            DropBot UUID.
+        test_name : str, optional
+            Test name.
+        start, end : datetime.datetime or float, optional
+            Time range (UTC).
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per test result, with the columns ``uuid``,
+            ``test_name``, ``timestamp`` (:class:`datetime.datetime`),
+            ``software_version`` and ``result`` (see :meth:`read`), sorted by
+            timestamp.
+        '''
+        conditions = []
+        condvars = {}
+        for column, value, operator in (('uuid', uuid, '=='),
+                                        ('test_name', test_name, '=='),
+                                        ('timestamp', _to_timestamp(start),
+                                         '>='),
+                                        ('timestamp', _to_timestamp(end),
+                                         '<=')):
+            if value is not None:
+                name = 'v%d' % len(condvars)
+                conditions.append('(%s %s %s)' % (column, operator, name))
+                condvars[name] = value
+        if not self.path.isfile():
+            return pd.DataFrame(columns=['uuid', 'test_name', 'timestamp',
+                                         'software_version', 'result'])
+        with self._lock:
+            h5f = self._open()
+            try:
+                table = h5f.root.index
+                if conditions:
+                    rows = table.read_where(' & '.join(conditions),
+                                            condvars=condvars)
+                else:
+                    rows = table.read()
+            finally:
+                h5f.close()
+        df = pd.DataFrame(rows)
+        if df.size:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+            df.sort_values('timestamp', inplace=True)
+            df.reset_index(drop=True, inplace=True)
+        return df
+
+    def read(self, result):
+        '''
+        Parameters
+        ----------
+        result : int
+            Index of result group (see :meth:`query`).
+
+        Returns
+        -------
+        object
+            Test result.
+        '''
+        with self._lock:
+            h5f = self._open()
+            try:
+                return _read_group(h5f.get_node('/results/r%d' %
+                                                result))['result']
+            finally:
+                h5f.close()
+
+    def latest(self, uuid, test_name):
+        '''
+        Returns
+        -------
+        object
+            Most recent result of test for DropBot, or ``None`` if there is
+            no result.
+        '''
+        df = self.query(uuid=uuid, test_name=test_name)
+        if not df.size:
+            return None
+        return self.read(int(df['result'].iloc[-1]))
+
+    def import_json(self, json_paths, uuid=None):
+        '''
+        Import JSON results files (e.g., written by
+        :func:`dropbot.hardware_test.log_results`).
+
+        The timestamp of each file is parsed from the file name (e.g.,
+        ``results-2017-10-16T12_00_00.000000.json``) where possible, otherwise
+        the file modification time is used.
+
+        Parameters
+        ----------
+        json_paths : list
+            Paths of JSON results files.
+        uuid : str, optional
+            DropBot UUID to use for results that do not contain the UUID
+            (e.g., without ``system_info`` results).
+
+        Returns
+        -------
+        list
+            Paths of imported files (files that could not be read are
+            skipped).
+        '''
+        count = 0
+        imported = []
+        for json_path in sorted(map(ph.path, json_paths)):
+            try:
+                with json_path.open('r') as input_:
+                    results = json_tricks.loads(input_.read())
+                if not isinstance(results, dict):
+                    raise ValueError('Unexpected results format.')
+            except Exception:
+                logger.warning('Could not read `%s`.', json_path,
+                               exc_info=True)
+                continue
+            count += len(self.append(_find_value(results, 'uuid') or uuid,
+                                     results,
+                                     timestamp=_file_timestamp(json_path),
+                                     software_version=_find_value(
+                                         results, 'software_version') or ''))
+            imported.append(json_path)
+        logger.info('Imported %d test results from %d of %d files.', count,
+                    len(imported), len(json_paths))
+        return imported
+
+
+def _find_value(data, key):
+    '''
+    Returns
+    -------
+    object
+        First value of :data:`key` found in nested dictionaries, or ``None``.
+    '''
+    if not isinstance(data, dict):
+        return None
+    if key in data:
+        return data[key]
+    for value in data.itervalues():
+        found = _find_value(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _file_timestamp(path):
+    match = re.search(r'(\d{4}-\d{2}-\d{2}T\d{2}_\d{2}_\d{2}(\.\d+)?)',
+                      path.namebase)
+    if match:
+        timestamp = match.group(1).replace('_', ':')
+        try:
+            # Local time (see `datetime.datetime.now()`).
+            return time.mktime(pd.Timestamp(timestamp).timetuple())
+        except ValueError:
+            pass
+    return path.getmtime()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import JSON diagnostic '
+                                     'test results into HDF5 store.')
+    parser.add_argument('store', help='Path of HDF5 store.')
+    parser.add_argument('json_paths', nargs='+', help='JSON results files.')
+    parser.add_argument('--uuid', help='DropBot UUID of results without '
+                        '`system_info` results.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    DiagnosticsStore(args.store).import_json(args.json_paths, uuid=args.uuid)
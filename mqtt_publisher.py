@@ -0,0 +1,139 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+.. versionadded:: 0.17
+"""
+from collections import Counter, OrderedDict
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _equal(a, b):
+    try:
+        return bool(a == b)
+    except Exception:
+        # E.g., comparison of arrays is ambiguous.
+        return False
+
+
+class CoalescingPublisher(object):
+    '''
+    Outbound message publisher that coalesces bursts of messages and drops
+    duplicate payloads.
+
+    Messages submitted for the same event within :attr:`window` seconds are
+    coalesced, i.e., only the most recent payload is published when the
+    window elapses.  Payloads identical to the last payload published for the
+    same event are not published at all.
+
+    Parameters
+    ----------
+    publish : callable
+        Called with event name and payload to publish a message.
+    window : float, optional
+        Coalescing window (in seconds).
+
+    Attributes
+    ----------
+    published : collections.Counter
+        Number of messages published, by event.
+    coalesced : collections.Counter
+        Number of messages superseded by a more recent payload within the
+        coalescing window, by event.
+    deduplicated : collections.Counter
+        Number of messages dropped because the payload matched the last
+        published payload, by event.
+    '''
+    def __init__(self, publish, window=.05):
+        self.publish = publish
+        self.window = window
+        self.published = Counter()
+        self.coalesced = Counter()
+        self.deduplicated = Counter()
+        self._pending = OrderedDict()
+        self._last = {}
+        self._lock = threading.Lock()
+        # Serialize flushes to preserve publishing order.
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def submit(self, event, data):
+        '''
+        Queue message for publishing at end of coalescing window.
+        '''
+        with self._lock:
+            if event in self._pending:
+                self.coalesced[event] += 1
+            elif event in self._last and _equal(self._last[event], data):
+                self.deduplicated[event] += 1
+                return
+            self._pending[event] = data
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        '''
+        Publish all pending messages.
+        '''
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = OrderedDict()
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            self._publish(pending)
+
+    def _publish(self, pending):
+        for event, data in pending.iteritems():
+            if event in self._last and _equal(self._last[event], data):
+                self.deduplicated[event] += 1
+                continue
+            try:
+                self.publish(event, data)
+            except Exception:
+                logger.error('Error publishing `%s` message.', event,
+                             exc_info=True)
+                continue
+            self._last[event] = data
+            self.published[event] += 1
+
+    def forget(self):
+        '''
+        Forget last published payloads (e.g., after reconnecting to the
+        broker), so the next payload for each event is published.
+        '''
+        with self._lock:
+            self._last.clear()
+
+    @property
+    def stats(self):
+        '''
+        Returns
+        -------
+        dict
+            Per-event ``published``, ``coalesced``, and ``deduplicated``
+            message counts.
+        '''
+        return {'published': dict(self.published),
+                'coalesced': dict(self.coalesced),
+                'deduplicated': dict(self.deduplicated)}
@@ -0,0 +1,147 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Persistent cache of the serial port (and USB device info) each DropBot was
+last connected on, keyed by DropBot UUID.
+
+.. versionadded:: 0.17
+"""
+import datetime as dt
+import json
+import logging
+
+import path_helpers as ph
+
+logger = logging.getLogger(__name__)
+
+
+def serial_port_infos():
+    '''
+    Returns
+    -------
+    dict
+        USB vendor id (``vid``), product id (``pid``) and serial number
+        (``serial_number``) of each available serial port, keyed by port
+        name.  Values are ``None`` where not available (e.g., non-USB
+        ports).
+    '''
+    try:
+        import serial.tools.list_ports
+    except ImportError:
+        logger.debug('`pyserial` not available.', exc_info=True)
+        return {}
+    infos = {}
+    for port_info in serial.tools.list_ports.comports():
+        # `port_info[0]` is the port name (for any `pyserial` version).
+        infos[port_info[0]] = {key: getattr(port_info, key, None)
+                               for key in ('vid', 'pid', 'serial_number')}
+    return infos
+
+
+class PortCache(object):
+    '''
+    Parameters
+    ----------
+    path : str
+        Path of JSON cache file.
+
+    Attributes
+    ----------
+    entries : dict
+        Cache entries keyed by DropBot UUID (string).  Each entry contains the
+        DropBot ``id``, last serial ``port``, USB ``vid``, ``pid`` and
+        ``serial_number``, firmware ``software_version`` and ``timestamp`` of
+        last connection.
+    '''
+    def __init__(self, path):
+        self.path = ph.path(path)
+        self.entries = self._load()
+
+    def _load(self):
+        if not self.path.isfile():
+            return {}
+        try:
+            with self.path.open('r') as input_:
+                entries = json.load(input_)
+            if not isinstance(entries, dict):
+                raise ValueError('Unexpected port cache format.')
+            return entries
+        except Exception:
+            logger.warning('Could not read port cache `%s`.', self.path,
+                           exc_info=True)
+            return {}
+
+    def save(self):
+        try:
+            self.path.parent.makedirs_p()
+            with self.path.open('w') as output:
+                json.dump(self.entries, output, indent=2)
+        except Exception:
+            logger.warning('Could not write port cache `%s`.', self.path,
+                           exc_info=True)
+
+    def candidates(self, port_infos):
+        '''
+        Parameters
+        ----------
+        port_infos : dict
+            USB device info of each available serial port (see
+            :func:`serial_port_infos`).
+
+        Returns
+        -------
+        list
+            ``(uuid, port)`` tuple for each cached DropBot that may be
+            connected on an available port, most recently connected first.
+
+            If a port with the cached USB serial number (and vendor/product
+            id) is available, that port is used, even if the port name has
+            changed (e.g., after the DropBot was plugged into a different USB
+            port).  Otherwise, the last port is used if it is available.
+        '''
+        candidates = []
+        for uuid, entry in sorted(self.entries.iteritems(),
+                                  key=lambda item: item[1].get('timestamp'),
+                                  reverse=True):
+            usb_ports = [port for port, info in port_infos.iteritems()
+                         if entry.get('serial_number') and
+                         all(info.get(key) == entry.get(key)
+                             for key in ('vid', 'pid', 'serial_number'))]
+            if usb_ports:
+                candidates.append((uuid, usb_ports[0]))
+            elif entry.get('port') in port_infos:
+                candidates.append((uuid, entry['port']))
+        return candidates
+
+    def update(self, uuid, id_, port, software_version, port_info=None):
+        '''
+        Record DropBot connection.
+        '''
+        entry = {'id': id_, 'port': port,
+                 'software_version': software_version,
+                 'timestamp': dt.datetime.now().isoformat()}
+        entry.update(port_info or {})
+        self.entries[str(uuid)] = entry
+
+    def invalidate(self, uuid):
+        '''
+        Remove cache entry (e.g., if the DropBot was not found on the cached
+        port).
+        '''
+        if self.entries.pop(str(uuid), None) is not None:
+            logger.info('Invalidated cached port for DropBot `%s`.', uuid)
@@ -0,0 +1,175 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Concurrent discovery of DropBot serial ports.
+
+.. versionadded:: 0.17
+"""
+import logging
+import Queue
+import threading
+import time
+
+from dropbot import SerialProxy
+
+logger = logging.getLogger(__name__)
+
+
+def probe_dropbot(port):
+    '''
+    Connect to DropBot on specified serial port.
+
+    Parameters
+    ----------
+    port : str
+        Serial port.
+
+    Returns
+    -------
+    dropbot.SerialProxy
+        Connected DropBot.
+
+    Raises
+    ------
+    IOError
+        If device on port does not report the DropBot package name.
+    '''
+    proxy = SerialProxy(port=port)
+    try:
+        name = proxy.properties['package_name']
+        if name != proxy.host_package_name:
+            raise IOError('Device on port `%s` is not a DropBot (`%s`).' %
+                          (port, name))
+    except Exception:
+        proxy.terminate()
+        raise
+    return proxy
+
+
+def probe_ports(ports, probe, timeout=5., release=None):
+    '''
+    Probe serial ports concurrently and return the first successful result.
+
+    Parameters
+    ----------
+    ports : list
+        Serial ports to probe.
+    probe : callable
+        Called with a port in a separate thread per port.  Returns a result
+        (e.g., a connected device proxy) or raises an exception if the port
+        does not match.
+    timeout : float, optional
+        Maximum time (in seconds) to wait for probes to complete.
+    release : callable, optional
+        Called with results of successful probes that complete after the
+        first successful probe (or after the timeout), e.g., to disconnect.
+
+    Returns
+    -------
+    tuple
+        Port and probe result of first successful probe, or ``(None, None)``
+        if no probe succeeded before the timeout.
+    '''
+    results = Queue.Queue()
+    lock = threading.Lock()
+    # Set once a successful result has been claimed or the caller has stopped
+    # waiting for results.
+    state = {'closed': False}
+    start = time.time()
+
+    def _probe(port):
+        try:
+            result = probe(port)
+        except Exception, exception:
+            results.put((port, False, exception, time.time() - start))
+            return
+        with lock:
+            if not state['closed']:
+                state['closed'] = True
+                results.put((port, True, result, time.time() - start))
+                return
+        # Another port already matched (or caller timed out).
+        logger.debug('[probe_ports] release `%s` (%.0f ms)', port,
+                     1e3 * (time.time() - start))
+        if release is not None:
+            try:
+                release(result)
+            except Exception:
+                logger.debug('Error releasing `%s`.', port, exc_info=True)
+
+    for port in ports:
+        thread = threading.Thread(target=_probe, args=(port, ),
+                                  name='probe-%s' % port)
+        thread.daemon = True
+        thread.start()
+
+    pending = set(ports)
+    match = (None, None)
+    deadline = start + timeout
+    while pending:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        try:
+            port, success, value, duration = results.get(timeout=remaining)
+        except Queue.Empty:
+            break
+        pending.discard(port)
+        if success:
+            logger.info('[probe_ports] `%s` matched (%.0f ms)', port,
+                        1e3 * duration)
+            match = (port, value)
+            break
+        logger.info('[probe_ports] `%s` did not match (%.0f ms): %s', port,
+                    1e3 * duration, value)
+
+    with lock:
+        state['closed'] = True
+    for port in sorted(pending):
+        logger.info('[probe_ports] `%s` cancelled after %.0f ms', port,
+                    1e3 * (time.time() - start))
+    return match
+
+
+def discover_dropbot(ports, timeout=5.):
+    '''
+    Probe serial ports concurrently and connect to the first port with a
+    DropBot.
+
+    Parameters
+    ----------
+    ports : list
+        Serial ports to probe.
+    timeout : float, optional
+        Maximum time (in seconds) to wait for probes to complete.
+
+    Returns
+    -------
+    dropbot.SerialProxy
+        Connected DropBot.
+
+    Raises
+    ------
+    IOError
+        If no DropBot was found.
+    '''
+    port, proxy = probe_ports(ports, probe_dropbot, timeout=timeout,
+                              release=lambda proxy: proxy.terminate())
+    if proxy is None:
+        raise IOError('No DropBot found on ports: %s' % ', '.join(ports))
+    return proxy
@@ -0,0 +1,199 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Compilation of protocol steps into contiguous arrays.
+
+.. versionadded:: 0.17
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from .validation import validate_waveforms
+
+
+class CompiledProtocol(object):
+    '''
+    Channel states and waveform options of all protocol steps.
+
+    Parameters
+    ----------
+    channel_matrix : numpy.ndarray
+        Packed (see :func:`numpy.packbits`) step × channel boolean matrix of
+        channel actuation states, i.e., one row of ``uint8`` per step.
+    channel_count : int
+        Number of channels (i.e., unpacked columns) in
+        :data:`channel_matrix`.
+    known : numpy.ndarray
+        Boolean mask of steps with known channel states.
+    voltages, frequencies, durations : numpy.ndarray
+        Waveform voltage, frequency and duration of each step.
+    '''
+    def __init__(self, channel_matrix, channel_count, known, voltages,
+                 frequencies, durations):
+        self.channel_matrix = channel_matrix
+        self.channel_count = channel_count
+        self.known = known
+        self.voltages = voltages
+        self.frequencies = frequencies
+        self.durations = durations
+        #: Compilation time (in seconds).
+        self.compile_time = None
+
+    def __len__(self):
+        return self.voltages.size
+
+    @property
+    def nbytes(self):
+        '''
+        Returns
+        -------
+        int
+            Memory used by compiled arrays (in bytes).
+        '''
+        return sum(array_i.nbytes for array_i in (self.channel_matrix,
+                                                  self.known, self.voltages,
+                                                  self.frequencies,
+                                                  self.durations))
+
+    def channel_states(self, step_number, size=None):
+        '''
+        Parameters
+        ----------
+        step_number : int
+            Step index.
+        size : int, optional
+            Number of channels to return (default: :attr:`channel_count`).
+            Channels beyond :attr:`channel_count` are off.
+
+        Returns
+        -------
+        numpy.ndarray
+            Actuation state of each channel, or ``None`` if channel states of
+            step are not known.
+        '''
+        if not self.known[step_number]:
+            return None
+        if size is None:
+            size = self.channel_count
+        states = np.zeros(size, dtype=int)
+        unpacked = np.unpackbits(self.channel_matrix[step_number])
+        count = min(size, self.channel_count)
+        states[:count] = unpacked[:count]
+        return states
+
+    def step_options(self, step_number):
+        '''
+        Returns
+        -------
+        dict
+            Waveform ``duration``, ``voltage`` and ``frequency`` of step.
+        '''
+        return {'duration': int(self.durations[step_number]),
+                'voltage': float(self.voltages[step_number]),
+                'frequency': float(self.frequencies[step_number])}
+
+    def validate(self, number_of_channels, limits=None):
+        '''
+        Parameters
+        ----------
+        number_of_channels : int
+            Number of control board channels.
+        limits : WaveformLimits, optional
+            Waveform limits (see :func:`validation.validate_waveforms`).
+
+        Returns
+        -------
+        dict
+            Indices of steps with ``voltage`` and ``frequency`` outside of
+            limits, and of steps actuating ``channels`` that are not
+            available on the control board.
+        '''
+        invalid = validate_waveforms(self.voltages, self.frequencies,
+                                     limits=limits)
+        if self.channel_count > number_of_channels:
+            # Check unpacked columns beyond the number of board channels.
+            unpacked = np.unpackbits(self.channel_matrix, axis=1)
+            extra = unpacked[:, number_of_channels:self.channel_count]
+            invalid['channels'] = np.flatnonzero(extra.any(axis=1))
+        else:
+            invalid['channels'] = np.array([], dtype=int)
+        return invalid
+
+
+def compile_steps(step_options, step_electrode_states, electrode_channels,
+                  channel_count=0):
+    '''
+    Compile protocol steps into a :class:`CompiledProtocol`.
+
+    Parameters
+    ----------
+    step_options : list
+        Options (``duration``, ``voltage``, ``frequency``) of each step.
+    step_electrode_states : list
+        Actuation state of each electrode (``pandas.Series`` indexed by
+        electrode id) for each step, or ``None`` where unknown.
+    electrode_channels : pandas.Series
+        Channel number(s) of each electrode, indexed by electrode id.  If
+        ``None``, channel states of all steps are unknown.
+    channel_count : int, optional
+        Minimum number of channels (e.g., number of control board channels).
+
+    Returns
+    -------
+    CompiledProtocol
+    '''
+    start = time.time()
+    step_count = len(step_options)
+    known = np.array([states is not None and electrode_channels is not None
+                      for states in step_electrode_states], dtype=bool)
+    if step_count and known.any():
+        channel_count = max(channel_count,
+                            int(electrode_channels.max()) + 1
+                            if electrode_channels.size else 0)
+    matrix = np.zeros((step_count, channel_count), dtype=bool)
+
+    if known.any():
+        # Actuated electrodes of all steps as `(step, electrode_id)` pairs.
+        frames = []
+        for i in np.flatnonzero(known):
+            states = pd.Series(step_electrode_states[i])
+            frames.append(pd.DataFrame({'step': i, 'electrode_id':
+                                        states.index[states.astype(bool)
+                                                     .values]}))
+        actuated = pd.concat(frames) if frames else pd.DataFrame()
+        if actuated.size:
+            # Translate electrodes to channels in a single join.
+            channels = actuated.join(electrode_channels.rename('channel'),
+                                     on='electrode_id', how='inner')
+            matrix[channels['step'].values.astype(int),
+                   channels['channel'].values.astype(int)] = True
+
+    def _column(key, dtype):
+        return np.array([np.nan if options_i.get(key) is None
+                         else options_i[key] for options_i in step_options],
+                        dtype=dtype)
+
+    compiled = CompiledProtocol(np.packbits(matrix, axis=1), channel_count,
+                                known,
+                                _column('voltage', float),
+                                _column('frequency', float),
+                                _column('duration', float))
+    compiled.compile_time = time.time() - start
+    return compiled
@@ -0,0 +1,230 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Streaming serialization of self-test results.
+
+Results are written as a small JSON manifest (``<name>.json``) with all
+NumPy arrays stored in a compressed ``.npz`` sidecar (``<name>.npz``).  Each
+test result is written as soon as the test completes, and both files are
+complete after each write (i.e., results of completed tests are readable even
+if the process is killed during a later test).
+
+A Word report may be generated from saved results in a separate process (see
+:func:`start_report`), or from the command line::
+
+    python results_io.py self-test-<timestamp>.json self-test-<timestamp>.docx
+
+.. versionadded:: 0.17
+"""
+from collections import Mapping
+import io
+import subprocess
+import sys
+import zipfile
+
+import json_tricks
+import numpy as np
+import path_helpers as ph
+
+#: Manifest format version.
+FORMAT_VERSION = 1
+#: Key of array references in manifest.
+ARRAY_KEY = '__npz__'
+
+
+class ResultsWriter(object):
+    '''
+    Write test results to a JSON manifest and ``.npz`` array sidecar as each
+    test completes.
+
+    Parameters
+    ----------
+    path : str
+        Output path, without extension.
+
+    Attributes
+    ----------
+    manifest_path : path_helpers.path
+        Path of JSON manifest.
+    npz_path : path_helpers.path
+        Path of ``.npz`` sidecar.
+    '''
+    def __init__(self, path):
+        path = ph.path(path)
+        self.manifest_path = path.parent.joinpath(path.name + '.json')
+        self.npz_path = path.parent.joinpath(path.name + '.npz')
+        self._manifest = {'version': FORMAT_VERSION,
+                          'npz': self.npz_path.name, 'tests': [],
+                          'results': {}}
+        # Create empty sidecar.
+        self._open_npz('w').close()
+
+    def _open_npz(self, mode):
+        return zipfile.ZipFile(self.npz_path, mode,
+                               compression=zipfile.ZIP_DEFLATED,
+                               allowZip64=True)
+
+    def write(self, test_name, result):
+        '''
+        Write result of test.
+
+        Arrays are appended to the ``.npz`` sidecar (which is closed after
+        each write, i.e., its central directory is always complete) and the
+        manifest is rewritten (i.e., results of completed tests are saved even
+        if a later test fails).
+        '''
+        with self._open_npz('a') as npz:
+            encoded = self._encode(result, [test_name], npz)
+        self._manifest['results'][test_name] = encoded
+        self._manifest['tests'].append(test_name)
+        with self.manifest_path.open('w') as output:
+            output.write(json_tricks.dumps(self._manifest, indent=2))
+
+    def _encode(self, value, key_path, npz):
+        if isinstance(value, dict):
+            return {key: self._encode(value_i, key_path + [str(key)], npz)
+                    for key, value_i in value.iteritems()}
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            key = '/'.join(key_path)
+            buffer_ = io.BytesIO()
+            np.lib.format.write_array(buffer_, value, allow_pickle=False)
+            npz.writestr(key + '.npy', buffer_.getvalue())
+            return {ARRAY_KEY: key}
+        return value
+
+
+class LazyResults(Mapping):
+    '''
+    Test results loaded from a manifest written by :class:`ResultsWriter`.
+
+    Arrays of each test are only read from the ``.npz`` sidecar when the
+    result of the test is first accessed.
+
+    Parameters
+    ----------
+    manifest_path : str
+        Path of JSON manifest.
+    '''
+    def __init__(self, manifest_path):
+        self.manifest_path = ph.path(manifest_path)
+        with self.manifest_path.open('r') as input_:
+            self._manifest = json_tricks.loads(input_.read())
+        self._npz = None
+        self._results = {}
+
+    @property
+    def tests(self):
+        '''
+        Names of tests, in order of completion.
+        '''
+        return list(self._manifest['tests'])
+
+    def __getitem__(self, test_name):
+        if test_name not in self._results:
+            encoded = self._manifest['results'][test_name]
+            self._results[test_name] = self._decode(encoded)
+        return self._results[test_name]
+
+    def __iter__(self):
+        return iter(self._manifest['tests'])
+
+    def __len__(self):
+        return len(self._manifest['tests'])
+
+    def _decode(self, value):
+        if isinstance(value, dict):
+            if ARRAY_KEY in value and len(value) == 1:
+                if self._npz is None:
+                    self._npz = np.load(self.manifest_path.parent
+                                        .joinpath(self._manifest['npz']))
+                return self._npz[value[ARRAY_KEY]]
+            return {key: self._decode(value_i)
+                    for key, value_i in value.iteritems()}
+        return value
+
+    def close(self):
+        if self._npz is not None:
+            self._npz.close()
+            self._npz = None
+
+
+def load_results(manifest_path):
+    '''
+    Parameters
+    ----------
+    manifest_path : str
+        Path of JSON manifest written by :class:`ResultsWriter`.
+
+    Returns
+    -------
+    LazyResults
+        Test results, by test name.
+    '''
+    return LazyResults(manifest_path)
+
+
+def generate_report(manifest_path, report_path):
+    '''
+    Generate Word report from saved test results.
+
+    Parameters
+    ----------
+    manifest_path : str
+        Path of JSON manifest written by :class:`ResultsWriter`.
+    report_path : str
+        Output path of Word document.
+    '''
+    import dropbot.self_test
+
+    results = load_results(manifest_path)
+    try:
+        dropbot.self_test.generate_report(dict(results),
+                                          output_path=report_path, force=True)
+    finally:
+        results.close()
+
+
+def start_report(manifest_path, report_path):
+    '''
+    Start generating Word report from saved test results (see
+    :func:`generate_report`) in a separate process.
+
+    Returns
+    -------
+    subprocess.Popen
+        Report process.  Standard output and error are combined in
+        ``stdout``.
+    '''
+    script = ph.path(__file__).realpath()
+    if script.ext in ('.pyc', '.pyo'):
+        script = script.stripext() + '.py'
+    return subprocess.Popen([sys.executable, script, manifest_path,
+                             report_path], stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate Word report from '
+                                     'saved self-test results.')
+    parser.add_argument('manifest_path', help='JSON results manifest.')
+    parser.add_argument('report_path', help='Output Word document.')
+    args = parser.parse_args()
+
+    generate_report(args.manifest_path, args.report_path)
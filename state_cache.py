@@ -0,0 +1,124 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+.. versionadded:: 0.17
+"""
+from collections import Counter
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class AppliedStateCache(object):
+    '''
+    Cache of the most recent values written to the control board (e.g.,
+    waveform voltage and frequency, high-voltage output state, and channel
+    states).
+
+    Writes of values that match the cache may be skipped, saving a serial
+    transaction each.
+
+    The cache must be cleared whenever the state of the control board is not
+    known, e.g., after reconnecting, after an error, or after the high-voltage
+    output has been disabled.
+
+    Attributes
+    ----------
+    sent : collections.Counter
+        Number of writes sent to the control board, by key.
+    skipped : collections.Counter
+        Number of writes skipped because the value matched the cache, by key.
+    '''
+    def __init__(self):
+        self._values = {}
+        self.sent = Counter()
+        self.skipped = Counter()
+
+    def clear(self):
+        '''
+        Invalidate all cached values.
+        '''
+        self._values.clear()
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def matches(self, key, value):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if the cached value for :data:`key` equals
+            :data:`value`.
+        '''
+        if key not in self._values:
+            return False
+        cached = self._values[key]
+        if isinstance(value, np.ndarray) or isinstance(cached, np.ndarray):
+            return np.array_equal(cached, value)
+        return cached == value
+
+    def should_write(self, key, value):
+        '''
+        Returns
+        -------
+        bool
+            ``False`` if :data:`value` matches the cached value for
+            :data:`key` (the skipped write is counted), ``True`` otherwise.
+        '''
+        if self.matches(key, value):
+            self.skipped[key] += 1
+            logger.debug('Skip redundant `%s` write (%d skipped).', key,
+                         self.skipped[key])
+            return False
+        return True
+
+    def store(self, key, value, count=True):
+        '''
+        Record value written to (or read from) the control board.
+
+        Parameters
+        ----------
+        key : str
+            Name of state value.
+        value : object
+            State value.
+        count : bool, optional
+            If ``True``, count value as write sent to the control board.
+        '''
+        if isinstance(value, np.ndarray):
+            # Copy, since array may be modified in place after writing.
+            value = value.copy()
+        self._values[key] = value
+        if count:
+            self.sent[key] += 1
+
+    def discard(self, key):
+        self._values.pop(key, None)
+
+    @property
+    def stats(self):
+        '''
+        Returns
+        -------
+        dict
+            Number of writes ``sent`` and ``skipped``, by key.
+        '''
+        return {'sent': dict(self.sent), 'skipped': dict(self.skipped)}
@@ -0,0 +1,315 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Protocol step timing against monotonic deadlines.
+
+.. versionadded:: 0.17
+"""
+from collections import namedtuple
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _posix_monotonic():
+    '''
+    Returns
+    -------
+    callable
+        Returns time (in seconds) of ``CLOCK_MONOTONIC`` clock (see
+        ``clock_gettime(2)``).
+    '''
+    import ctypes
+    import ctypes.util
+    import sys
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    # `CLOCK_MONOTONIC` clock id (see `time.h`).
+    clock_id = 6 if sys.platform == 'darwin' else 1
+    libc = ctypes.CDLL(ctypes.util.find_library('rt') or
+                       ctypes.util.find_library('c'), use_errno=True)
+    clock_gettime = libc.clock_gettime
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+    def _monotonic():
+        value = timespec()
+        if clock_gettime(clock_id, ctypes.byref(value)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return value.tv_sec + 1e-9 * value.tv_nsec
+    _monotonic()
+    return _monotonic
+
+
+if hasattr(time, 'monotonic'):
+    monotonic = time.monotonic
+elif os.name == 'nt':
+    # `time.clock()` is a high-resolution monotonic counter on Windows.
+    monotonic = time.clock
+else:
+    try:
+        # `monotonic` backport package.
+        from monotonic import monotonic
+    except ImportError:
+        monotonic = _posix_monotonic()
+
+
+class StepTiming(namedtuple('StepTiming', 'step_number planned_start '
+                            'actual_start planned_end deadline actual_end')):
+    '''
+    Planned and actual times (in seconds since start of run) of a step.
+
+    Attributes
+    ----------
+    step_number : int
+        Step index.
+    planned_start : float
+        Start time if all previous steps had completed exactly on time.
+    actual_start : float
+        Time step started (i.e., before control board writes).
+    planned_end : float
+        ``planned_start`` plus step duration.
+    deadline : float
+        ``actual_start`` plus step duration.
+    actual_end : float
+        Time step completion was signalled on the main thread.
+    '''
+    __slots__ = ()
+
+
+class StepScheduler(object):
+    '''
+    Thread that waits for the end of each protocol step.
+
+    The deadline of each step is measured from the (monotonic) time the step
+    started, *before* control board writes, such that hardware write latency
+    counts towards the step duration.
+
+    Parameters
+    ----------
+    dispatch : callable
+        Called from the scheduler thread as ``dispatch(func, *args)`` to call
+        ``func(*args)`` on the main thread (e.g., :func:`gobject.idle_add`).
+    spin_time : float, optional
+        Time (in seconds) before each deadline to busy-wait rather than sleep.
+    name : str, optional
+        Thread name.
+
+    Attributes
+    ----------
+    timings : list
+        :class:`StepTiming` of each completed step of current run.
+    gaps : list
+        Time (in seconds) from completion of each step to the end of the
+        transition to the next step (see :meth:`record_transition`).
+    '''
+    def __init__(self, dispatch, spin_time=.002, name='dropbot-steps'):
+        self.dispatch = dispatch
+        self.spin_time = spin_time
+        self.name = name
+        self.timings = []
+        self.gaps = []
+        # Time most recent step completed (if next transition not recorded).
+        self._last_end = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        # Incremented to invalidate pending step (see `cancel()`).
+        self._generation = 0
+        self._pending = None
+        # Deadline and timing of step dispatched but not yet completed.
+        self._dispatched = None
+        self._run_start = None
+        self._planned_end = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._condition:
+            self._stopped = True
+            self._generation += 1
+            self._pending = None
+            self._dispatched = None
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def reset(self):
+        '''
+        Start new run (i.e., clear step timings).
+        '''
+        self.cancel()
+        with self._condition:
+            self._run_start = None
+            self._planned_end = None
+            self._last_end = None
+            self.timings = []
+            self.gaps = []
+
+    def schedule(self, step_number, duration, callback, start=None):
+        '''
+        Call ``callback`` on the main thread once step duration has elapsed.
+
+        Any pending step is cancelled.  If the pending step has the same
+        step number (i.e., the step is re-run, e.g., after its channel states
+        are updated), the original start and deadline of the step are kept.
+
+        Parameters
+        ----------
+        step_number : int
+            Step index.
+        duration : float
+            Step duration (in milliseconds).
+        callback : callable
+            Called (without arguments) on main thread at end of step.
+        start : float, optional
+            Time step started (see :func:`monotonic`; default: now).
+        '''
+        if start is None:
+            start = monotonic()
+        with self._condition:
+            if self._pending is not None:
+                current = self._pending[1], self._pending[3]
+            else:
+                current = self._dispatched
+            if (current is not None and
+                    current[1]['step_number'] == step_number):
+                # Step re-run; keep original timing.
+                deadline, timing = current
+            else:
+                if self._run_start is None:
+                    self._run_start = start
+                    self._planned_end = start
+                planned_start = self._planned_end
+                self._planned_end = planned_start + duration * 1e-3
+                deadline = start + duration * 1e-3
+                timing = {'step_number': step_number,
+                          'planned_start': planned_start,
+                          'actual_start': start,
+                          'planned_end': self._planned_end,
+                          'deadline': deadline}
+            self._generation += 1
+            self._pending = (self._generation, deadline, callback, timing)
+            self._dispatched = None
+            self._condition.notify()
+
+    def cancel(self):
+        '''
+        Cancel pending step (callback is not called).
+        '''
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+            self._dispatched = None
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and self._pending is None:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation, deadline, callback, timing = self._pending
+                remaining = deadline - monotonic()
+                if remaining > self.spin_time:
+                    # Sleep until shortly before deadline, unless woken by a
+                    # new or cancelled step.
+                    self._condition.wait(remaining - self.spin_time)
+                    continue
+                self._pending = None
+                self._dispatched = deadline, timing
+            while monotonic() < deadline:
+                pass
+            self.dispatch(self._complete, generation, callback, timing)
+
+    def _complete(self, generation, callback, timing):
+        with self._condition:
+            if generation != self._generation:
+                # Step was cancelled (or superseded) after deadline.
+                return False
+            self._dispatched = None
+            run_start = self._run_start
+            timing['actual_end'] = monotonic()
+            self._last_end = timing['actual_end']
+            self.timings.append(StepTiming(**{key: (value - run_start
+                                                    if key != 'step_number'
+                                                    else value)
+                                              for key, value in
+                                              timing.iteritems()}))
+        callback()
+        return False
+
+    def record_transition(self, end=None):
+        '''
+        Record end of transition from previous step (e.g., once control board
+        writes of next step have been issued).
+
+        Parameters
+        ----------
+        end : float, optional
+            Time transition ended (see :func:`monotonic`; default: now).
+        '''
+        if end is None:
+            end = monotonic()
+        with self._condition:
+            if self._last_end is not None:
+                self.gaps.append(end - self._last_end)
+                self._last_end = None
+
+    def summary(self):
+        '''
+        Returns
+        -------
+        dict
+            Number of completed ``steps``, ``planned`` and ``actual`` run
+            duration, and mean/maximum step start lag (actual vs. planned
+            start), end lag (actual end vs. deadline) and inter-step gap (see
+            :attr:`gaps`), in seconds.
+        '''
+        timings = list(self.timings)
+        gaps = list(self.gaps)
+        if not timings:
+            return {'steps': 0}
+        start_lags = [t.actual_start - t.planned_start for t in timings]
+        end_lags = [t.actual_end - t.deadline for t in timings]
+        return {'steps': len(timings),
+                'planned': timings[-1].planned_end,
+                'actual': timings[-1].actual_end,
+                'start_lag_mean': sum(start_lags) / len(timings),
+                'start_lag_max': max(start_lags),
+                'end_lag_mean': sum(end_lags) / len(timings),
+                'end_lag_max': max(end_lags),
+                'gap_mean': sum(gaps) / len(gaps) if gaps else None,
+                'gap_max': max(gaps) if gaps else None}
@@ -0,0 +1,91 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Application of step state to the control board as a single transaction.
+
+.. versionadded:: 0.17
+"""
+from collections import OrderedDict
+import time
+
+#: Keys of step state (see :func:`apply_step`), in order of application.
+STEP_STATE_KEYS = ('frequency', 'voltage', 'hv_output_enabled',
+                   'channel_states', 'measure_voltage')
+
+
+def apply_step(board, state):
+    '''
+    Apply step state to control board with commands issued back-to-back.
+
+    Intended to be called in the hardware I/O worker thread (see
+    :meth:`board_worker.BoardProxy.submit_job`), such that no other commands
+    are interleaved.
+
+    Parameters
+    ----------
+    board : dropbot.SerialProxy
+        Control board.
+    state : dict
+        Any of the following (see :data:`STEP_STATE_KEYS`):
+
+        - ``frequency``: waveform frequency (in Hz).
+        - ``voltage``: waveform voltage (in V).
+        - ``hv_output_enabled``: high-voltage output state.
+        - ``channel_states``: actuation state of each channel.
+        - ``measure_voltage``: if ``True``, measure voltage after all writes.
+
+    Returns
+    -------
+    dict
+        ``results``: frequency and voltage read back after each write, and
+        ``measured_voltage`` (if requested).
+
+        ``timings``: duration (in seconds) of each command, in order of
+        execution.
+
+        ``duration``: total duration (in seconds).
+    '''
+    results = {}
+    timings = OrderedDict()
+    start = time.time()
+
+    def _timed(command, func, *args):
+        command_start = time.time()
+        try:
+            return func(*args)
+        finally:
+            timings[command] = time.time() - command_start
+
+    for key in ('frequency', 'voltage'):
+        if key in state:
+            _timed(key + '=', setattr, board, key, state[key])
+            results[key] = _timed(key, getattr, board, key)
+    if 'hv_output_enabled' in state:
+        enabled = state['hv_output_enabled']
+        if _timed('hv_output_enabled', getattr, board,
+                  'hv_output_enabled') != enabled:
+            _timed('hv_output_enabled=', setattr, board, 'hv_output_enabled',
+                   enabled)
+    if 'channel_states' in state:
+        _timed('set_state_of_channels', board.set_state_of_channels,
+               state['channel_states'])
+    if state.get('measure_voltage'):
+        results['measured_voltage'] = _timed('measure_voltage',
+                                             board.measure_voltage)
+    return {'results': results, 'timings': timings,
+            'duration': time.time() - start}
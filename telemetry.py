@@ -0,0 +1,328 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Background sampling of control board telemetry (e.g., measured voltage).
+
+.. versionadded:: 0.17
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicSampler(object):
+    '''
+    Call a measurement function from a background thread, periodically and
+    whenever a fresh sample is requested, and keep the latest value.
+
+    Parameters
+    ----------
+    measure : callable
+        Called (without arguments) to take a measurement.  May return
+        ``None`` if no measurement is available (e.g., no control board is
+        connected).
+    interval : float, optional
+        Maximum time (in seconds) between samples.
+    name : str, optional
+        Name of sampler thread.
+    on_sample : callable, optional
+        Called (from sampler thread) with each sampled value and its
+        timestamp (i.e., ``time.time()``).
+
+    Attributes
+    ----------
+    latest : object
+        Most recent sampled value (``None`` if no value has been sampled).
+    timestamp : float
+        Time of most recent sample, as returned by ``time.time()``.
+    '''
+    def __init__(self, measure, interval=2., name=None, on_sample=None):
+        self.measure = measure
+        self.interval = interval
+        self.name = name
+        self.on_sample = on_sample
+        self.latest = None
+        self.timestamp = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        '''
+        Stop sampler thread.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time (in seconds) to wait for an in-progress measurement to
+            complete.
+        '''
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def clear(self):
+        '''
+        Discard latest value (e.g., after the control board is reconnected).
+        '''
+        self.latest = None
+        self.timestamp = None
+
+    def request(self):
+        '''
+        Request a fresh sample as soon as possible (without blocking).
+        '''
+        self._wake.set()
+
+    def sample(self):
+        '''
+        Take a measurement in the calling thread and record it as the latest
+        value.
+
+        Returns
+        -------
+        object
+            Measured value (or ``None`` if no measurement is available).
+        '''
+        value = self.measure()
+        if value is not None:
+            self._record(value, time.time())
+        return value
+
+    def _record(self, value, timestamp):
+        self.latest, self.timestamp = value, timestamp
+        if self.on_sample is not None:
+            self.on_sample(value, timestamp)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception:
+                logger.debug('Error sampling `%s`.', self.name, exc_info=True)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+class RingBuffer(object):
+    '''
+    Fixed-size buffer of the most recent timestamped scalar values.
+
+    Appending is thread-safe; all queries return copies.
+
+    Parameters
+    ----------
+    size : int
+        Maximum number of values to keep.
+    '''
+    def __init__(self, size):
+        self.values = np.empty(size, dtype=float)
+        self.timestamps = np.empty(size, dtype=float)
+        self._index = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def size(self):
+        return self.values.size
+
+    def append(self, value, timestamp):
+        with self._lock:
+            self.values[self._index] = value
+            self.timestamps[self._index] = timestamp
+            self._index = (self._index + 1) % self.values.size
+            self._count = min(self._count + 1, self.values.size)
+
+    def clear(self):
+        with self._lock:
+            self._index = 0
+            self._count = 0
+
+    def ordered(self):
+        '''
+        Returns
+        -------
+        tuple
+            Arrays of timestamps and values, oldest first.
+        '''
+        with self._lock:
+            start = (self._index - self._count) % self.values.size
+            order = (start + np.arange(self._count)) % self.values.size
+            return self.timestamps[order], self.values[order]
+
+    def latest(self):
+        '''
+        Returns
+        -------
+        tuple
+            Timestamp and value of most recent sample, or ``None`` if buffer
+            is empty.
+        '''
+        with self._lock:
+            if not self._count:
+                return None
+            index = (self._index - 1) % self.values.size
+            return self.timestamps[index], self.values[index]
+
+    def since(self, timestamp):
+        '''
+        Returns
+        -------
+        tuple
+            Arrays of timestamps and values of samples taken after
+            :data:`timestamp`, oldest first.
+        '''
+        timestamps, values = self.ordered()
+        # Timestamps are in ascending order.
+        start = np.searchsorted(timestamps, timestamp, side='right')
+        return timestamps[start:], values[start:]
+
+    def window_mean(self, duration, now=None):
+        '''
+        Parameters
+        ----------
+        duration : float
+            Window duration (in seconds).
+        now : float, optional
+            End of window (default: current time).
+
+        Returns
+        -------
+        float
+            Mean of values sampled within window (``nan`` if no values).
+        '''
+        if now is None:
+            now = time.time()
+        timestamps, values = self.since(now - duration)
+        values = values[timestamps <= now]
+        return values.mean() if values.size else np.nan
+
+
+class BufferedSampler(PeriodicSampler):
+    '''
+    Periodic sampler that records each sample in a :class:`RingBuffer` and
+    publishes the latest value at a throttled rate.
+
+    Parameters
+    ----------
+    measure : callable
+        See :class:`PeriodicSampler`.
+    interval : float, optional
+        Maximum time (in seconds) between samples.
+    size : int, optional
+        Number of samples to keep in ring buffer.
+    publish : callable, optional
+        Called (from sampler or timer thread) with latest value and its
+        timestamp, at most once every :data:`publish_interval` seconds.  The
+        latest value sampled within the interval is published once the
+        interval has elapsed (i.e., the latest value is never withheld).
+    publish_interval : float, optional
+        Minimum time (in seconds) between calls to :data:`publish`.
+    **kwargs
+        See :class:`PeriodicSampler`.
+
+    Attributes
+    ----------
+    buffer : RingBuffer
+        Timestamped samples.
+    '''
+    def __init__(self, measure, interval=.2, size=1024, publish=None,
+                 publish_interval=1., **kwargs):
+        super(BufferedSampler, self).__init__(measure, interval=interval,
+                                              **kwargs)
+        self.buffer = RingBuffer(size)
+        self.publish = publish
+        self.publish_interval = publish_interval
+        # Time of most recent publish.
+        self._published = None
+        # Latest value and timestamp not yet published.
+        self._unpublished = None
+        # Timer to publish latest value at end of publish interval.
+        self._publish_timer = None
+        self._publish_lock = threading.Lock()
+
+    def stop(self, timeout=None):
+        super(BufferedSampler, self).stop(timeout=timeout)
+        self._cancel_publish()
+
+    def clear(self):
+        super(BufferedSampler, self).clear()
+        self.buffer.clear()
+        self._cancel_publish()
+
+    def _cancel_publish(self):
+        with self._publish_lock:
+            if self._publish_timer is not None:
+                self._publish_timer.cancel()
+                self._publish_timer = None
+            self._unpublished = None
+
+    def _record(self, value, timestamp):
+        self.buffer.append(value, timestamp)
+        super(BufferedSampler, self)._record(value, timestamp)
+        if self.publish is None:
+            return
+        with self._publish_lock:
+            self._unpublished = value, timestamp
+            now = time.time()
+            if (self._published is None or
+                    now - self._published >= self.publish_interval):
+                self._publish_latest(now)
+            elif self._publish_timer is None:
+                # Publish latest value once publish interval has elapsed.
+                self._publish_timer = \
+                    threading.Timer(self._published + self.publish_interval -
+                                    now, self._on_publish_timer)
+                self._publish_timer.daemon = True
+                self._publish_timer.start()
+
+    def _on_publish_timer(self):
+        with self._publish_lock:
+            self._publish_timer = None
+            if self._unpublished is not None:
+                self._publish_latest(time.time())
+
+    def _publish_latest(self, now):
+        # Called with publish lock held.
+        value, timestamp = self._unpublished
+        self._unpublished = None
+        self._published = now
+        self.publish(value, timestamp)
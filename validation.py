@@ -0,0 +1,123 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Validation of step waveform options against control board limits.
+
+.. versionadded:: 0.17
+"""
+from collections import namedtuple
+
+import numpy as np
+
+
+class WaveformLimits(namedtuple('WaveformLimits',
+                                'max_voltage min_frequency max_frequency')):
+    '''
+    Waveform voltage (in V) and frequency (in Hz) limits of control board.
+    '''
+    __slots__ = ()
+
+    @classmethod
+    def from_device_info(cls, device_info):
+        '''
+        Parameters
+        ----------
+        device_info : DeviceInfo
+            Control board properties.
+        '''
+        return cls(device_info.max_waveform_voltage,
+                   device_info.min_waveform_frequency,
+                   device_info.max_waveform_frequency)
+
+
+#: Limits of connected control board (``None`` if not connected).
+_limits = None
+
+
+def set_limits(limits):
+    '''
+    Set limits used by :func:`max_voltage` and :func:`check_frequency`.
+
+    Parameters
+    ----------
+    limits : WaveformLimits
+        Limits of connected control board, or ``None`` if no control board is
+        connected (i.e., no limits are enforced).
+    '''
+    global _limits
+    _limits = limits
+
+
+def get_limits():
+    return _limits
+
+
+def validate_waveforms(voltages, frequencies, limits=None):
+    '''
+    Check voltages and frequencies of all steps at once.
+
+    Parameters
+    ----------
+    voltages : array_like
+        Voltage of each step.
+    frequencies : array_like
+        Frequency of each step.
+    limits : WaveformLimits, optional
+        Limits to check against (default: limits set by :func:`set_limits`).
+
+    Returns
+    -------
+    dict
+        Indices of steps with ``voltage`` and ``frequency`` outside of limits
+        (empty arrays if all steps are valid or no limits are set).
+    '''
+    if limits is None:
+        limits = _limits
+    voltages = np.asarray(voltages, dtype=float)
+    frequencies = np.asarray(frequencies, dtype=float)
+    if limits is None:
+        return {'voltage': np.array([], dtype=int),
+                'frequency': np.array([], dtype=int)}
+    return {'voltage': np.flatnonzero(voltages > limits.max_voltage),
+            'frequency': np.flatnonzero((frequencies < limits.min_frequency) |
+                                        (frequencies > limits.max_frequency))}
+
+
+def max_voltage(element, state):
+    """Verify that the voltage is below a set maximum"""
+    limits = _limits
+
+    if limits and element.value > limits.max_voltage:
+        return element.errors.append('Voltage exceeds the maximum value (%d '
+                                     'V).' % limits.max_voltage)
+    else:
+        return True
+
+
+def check_frequency(element, state):
+    """Verify that the frequency is within the valid range"""
+    limits = _limits
+
+    if limits and (element.value < limits.min_frequency or
+                   element.value > limits.max_frequency):
+        return element.errors.append('Frequency is outside of the valid range '
+                                     '(%.1f - %.1f Hz).' %
+                                     (limits.min_frequency,
+                                      limits.max_frequency))
+    else:
+        return True
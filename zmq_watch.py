@@ -0,0 +1,216 @@
+"""
+Copyright 2017 Ryan Fobel and Christian Fobel
+
+This file is part of dropbot_plugin.
+
+dropbot_plugin is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+dropbot_plugin is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with dropbot_plugin.  If not, see <http://www.gnu.org/licenses/>.
+
+Integration of 0MQ sockets with the GLib main loop.
+
+.. versionadded:: 0.17
+"""
+import logging
+
+import gobject
+import zmq
+
+logger = logging.getLogger(__name__)
+
+
+def sockets_pending(sockets):
+    '''
+    Parameters
+    ----------
+    sockets : list
+        List of 0MQ sockets.
+
+    Returns
+    -------
+    bool
+        ``True`` if any socket has at least one message waiting to be read.
+
+    Notes
+    -----
+    Reading ``ZMQ_EVENTS`` also resets the edge-triggered notification state
+    of the ``ZMQ_FD`` file descriptor of each socket.
+    '''
+    return any([bool(socket_i.getsockopt(zmq.EVENTS) & zmq.POLLIN)
+                for socket_i in sockets])
+
+
+class SocketPoller(object):
+    '''
+    Process 0MQ socket messages by polling at a fixed interval.
+
+    Parameters
+    ----------
+    sockets : list
+        List of 0MQ sockets.
+    process : callable
+        Called (without arguments) to process pending socket messages.
+    interval : int, optional
+        Polling interval in milliseconds.
+    '''
+    mode = 'poll'
+
+    def __init__(self, sockets, process, interval=10):
+        self.sockets = sockets
+        self.process = process
+        self.interval = interval
+        self._timeout_id = None
+
+    def _on_timeout(self):
+        self.process()
+        return True
+
+    def start(self):
+        self.stop()
+        self._timeout_id = gobject.timeout_add(self.interval, self._on_timeout)
+
+    def stop(self):
+        if self._timeout_id is not None:
+            gobject.source_remove(self._timeout_id)
+            self._timeout_id = None
+
+
+class SocketWatcher(object):
+    '''
+    Process 0MQ socket messages as soon as they arrive by watching the
+    ``ZMQ_FD`` file descriptor of each socket from the GLib main loop.
+
+    The ``ZMQ_FD`` file descriptor is *edge-triggered*, i.e., it only signals
+    a change in ``ZMQ_EVENTS``.  After each call to :attr:`process`, the
+    ``ZMQ_EVENTS`` of each socket is checked.  If any messages are still
+    pending (e.g., because :attr:`process` only reads a limited number of
+    messages per call), processing is continued from an idle callback.
+
+    No CPU time is consumed while sockets are idle.
+
+    Parameters
+    ----------
+    sockets : list
+        List of 0MQ sockets.
+    process : callable
+        Called (without arguments) to process pending socket messages.
+    '''
+    mode = 'event'
+
+    def __init__(self, sockets, process):
+        self.sockets = sockets
+        self.process = process
+        self._watch_ids = []
+        self._idle_id = None
+
+    def _process_pending(self):
+        '''
+        Process pending messages.
+
+        Returns
+        -------
+        bool
+            ``True`` if messages are still pending after processing.
+        '''
+        try:
+            self.process()
+        except Exception:
+            logger.error('Error processing socket messages.', exc_info=True)
+        return sockets_pending(self.sockets)
+
+    def _on_fd_ready(self, fd, condition):
+        if self._idle_id is None and self._process_pending():
+            self._idle_id = gobject.idle_add(self._on_idle)
+        return True
+
+    def _on_idle(self):
+        if self._process_pending():
+            return True
+        self._idle_id = None
+        return False
+
+    def start(self):
+        '''
+        Install file descriptor watches in GLib main loop.
+
+        Raises
+        ------
+        Exception
+            If a watch cannot be added for a socket file descriptor (e.g., on
+            platforms where GLib does not support watching the ``ZMQ_FD``
+            handle type).
+        '''
+        self.stop()
+        try:
+            for socket_i in self.sockets:
+                fd = socket_i.getsockopt(zmq.FD)
+                self._watch_ids.append(gobject
+                                       .io_add_watch(fd, gobject.IO_IN |
+                                                     gobject.IO_PRI |
+                                                     gobject.IO_ERR,
+                                                     self._on_fd_ready))
+        except Exception:
+            self.stop()
+            raise
+        # Messages may have been queued before watches were installed (no
+        # edge will be signalled for those), so process them explicitly.
+        self._idle_id = gobject.idle_add(self._on_idle)
+
+    def stop(self):
+        for watch_id in self._watch_ids:
+            gobject.source_remove(watch_id)
+        self._watch_ids = []
+        if self._idle_id is not None:
+            gobject.source_remove(self._idle_id)
+            self._idle_id = None
+
+
+def watch_sockets(sockets, process, mode='event', interval=10):
+    '''
+    Start processing 0MQ socket messages from the GLib main loop.
+
+    Parameters
+    ----------
+    sockets : list
+        List of 0MQ sockets.
+    process : callable
+        Called (without arguments) to process pending socket messages.
+    mode : str, optional
+        ``'event'``: process messages as soon as they arrive (see
+        :class:`SocketWatcher`).
+
+        ``'poll'``: poll for messages every :data:`interval` milliseconds (see
+        :class:`SocketPoller`).
+
+        If file descriptor watches are not supported, fall back to ``'poll'``.
+    interval : int, optional
+        Polling interval in milliseconds (only used in ``'poll'`` mode).
+
+    Returns
+    -------
+    SocketWatcher or SocketPoller
+        Started watcher.  Call ``stop()`` to stop processing messages.
+    '''
+    if mode == 'event':
+        watcher = SocketWatcher(sockets, process)
+        try:
+            watcher.start()
+            return watcher
+        except Exception:
+            logger.warning('Could not watch 0MQ socket file descriptors.  '
+                           'Falling back to polling every %d ms.', interval,
+                           exc_info=True)
+    elif mode != 'poll':
+        raise ValueError('Unsupported mode: `%s`' % mode)
+    poller = SocketPoller(sockets, process, interval=interval)
+    poller.start()
+    return poller